@@ -1,13 +1,44 @@
 from django.contrib import admin
-from .models import CustomUser, Department, Holiday, Status, Tag, Task, Notification, UserSchedule, Vacation
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
+from .models import CustomUser, Department, Holiday, Status, Tag, Task, Notification, UserSchedule, Vacation, ProfileReport
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin
 
 User = get_user_model()
 
+
+class EstimatedCountPaginator(Paginator):
+    # для больших таблиц без фильтров берём оценку из статистики PostgreSQL вместо COUNT(*)
+    estimate_threshold = 100000
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+
+        if connection.vendor == 'postgresql' and not query.where:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                               [query.model._meta.db_table])
+                row = cursor.fetchone()
+
+            if row and row[0] >= self.estimate_threshold:
+                return row[0]
+
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # без второго COUNT(*) на "показать все"
+    show_full_result_count = False
+
+
 class CustomUserInline(admin.StackedInline):
     model = CustomUser
     can_delete = False
+    autocomplete_fields = ('department',)
 
 admin.site.unregister(User)
 
@@ -16,19 +47,33 @@ class UserAdmin(UserAdmin):
     inlines = [CustomUserInline]
 
     list_filter = ('profile__department',)
-    search_fields = ('username', 'email')
+    search_fields = ('username', 'email', 'first_name', 'last_name')
     list_display = ('username', 'email', 'first_name', 'last_name')
 
+@admin.register(CustomUser)
+class CustomUserAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'department', 'job_title', 'telegram_username')
+    list_select_related = ('django_user', 'department')
+    search_fields = ('django_user__first_name', 'django_user__last_name', 'django_user__username')
+    autocomplete_fields = ('django_user', 'department')
+
+    # __str__ берёт имя из django_user - нужно и для автодополнения;
+    # ChangeList не добавляет list_select_related, если select_related уже есть
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(*self.list_select_related)
+
 @admin.register(Department)
 class DepartmentAdmin(admin.ModelAdmin):
     list_display = ['name']
     search_fields = ('name',)
+    autocomplete_fields = ('head_person',)
 
 @admin.register(Holiday)
 class HolidayAdmin(admin.ModelAdmin):
     list_display = ('name',)
     list_filter = ('department__name', 'date_time_start')
     search_fields = ('name',)
+    autocomplete_fields = ('department',)
 
 @admin.register(Status)
 class StatusAdmin(admin.ModelAdmin):
@@ -36,20 +81,27 @@ class StatusAdmin(admin.ModelAdmin):
 
 @admin.register(Tag)
 class TagsAdmin(admin.ModelAdmin):
-    list_display = ('category', 'subcategory', 'for_what')
+    list_display = ('category', 'subcategory', 'for_what', 'task_count')
     search_fields = ('category', 'subcategory', 'for_what')
 
 @admin.register(Task)
-class TasksAdmin(admin.ModelAdmin):
+class TasksAdmin(LargeTableAdmin):
     search_fields = ('head_task__title', 'title')
     list_filter = ('status', 'priority')
     list_display = ('title', 'status', 'priority', 'deadline', 'assigned_by', 'managed_by')
+    list_select_related = ('status', 'assigned_by__django_user', 'managed_by__django_user')
+    autocomplete_fields = ('head_task', 'assigned_by', 'managed_by', 'created_by', 'status', 'tag')
     readonly_fields = ('created_at', 'updated_at')
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(*self.list_select_related)
+
 @admin.register(Notification)
-class NotificationsAdmin(admin.ModelAdmin):
-    list_filter = ('type', 'send_time')
-    list_display = ('message', 'type', 'send_time', 'get_task_title')
+class NotificationsAdmin(LargeTableAdmin):
+    list_filter = ('type', 'status', 'send_time')
+    list_display = ('message', 'type', 'send_time', 'status', 'attempts', 'get_task_title')
+    list_select_related = ('task', 'user__django_user')
+    autocomplete_fields = ('user', 'task')
 
     #  description название колонки
     @admin.display(description="Task")
@@ -59,15 +111,34 @@ class NotificationsAdmin(admin.ModelAdmin):
 @admin.register(UserSchedule)
 class UserScheduleAdmin(admin.ModelAdmin):
     list_display = ('work_hours_start', 'work_hours_end', 'personal_hours_start', 'personal_hours_end', 'get_user')
+    list_select_related = ('user__django_user',)
+    search_fields = ('user__django_user__first_name', 'user__django_user__last_name')
+    autocomplete_fields = ('user',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(*self.list_select_related)
 
     @admin.display(description="User")
     def get_user(self, obj):
         return obj.user.django_user.get_full_name()
 
 @admin.register(Vacation)
-class VacationAdmin(admin.ModelAdmin):
+class VacationAdmin(LargeTableAdmin):
     list_display = ('date_start', 'date_end', 'tag', 'get_user')
+    list_select_related = ('user_schedule__user__django_user',)
+    autocomplete_fields = ('user_schedule',)
 
     @admin.display(description="User")
     def get_user(self, obj):
         return obj.user_schedule.user.django_user.get_full_name()
+
+@admin.register(ProfileReport)
+class ProfileReportAdmin(LargeTableAdmin):
+    list_display = ('created_at', 'method', 'path', 'view_name', 'status_code', 'duration_ms', 'query_count', 'user')
+    list_filter = ('view_name', 'method')
+    list_select_related = ('user',)
+    search_fields = ('path',)
+    readonly_fields = [field.name for field in ProfileReport._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,63 @@
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import cache
+from .holidays import holidays_in_range, parse_bounds
+from .serializers import HolidaySerializer
+
+
+def holidays_etag(request, *args, **kwargs):
+    # версия меняется при любом изменении праздников (сигналы Holiday), URL с фильтрами - часть ресурса
+    return str(cache.get_versions([cache.HOLIDAYS_VERSION])[cache.HOLIDAYS_VERSION])
+
+
+def department_etag(request, *args, **kwargs):
+    if not request.user.is_authenticated:
+        return None
+
+    department_key = cache.department_key(request.user.profile.department_id)
+    return f'{department_key}:{cache.get_versions([department_key])[department_key]}'
+
+
+def range_params(request):
+    start = request.query_params.get('start')
+    end = request.query_params.get('end')
+
+    if not start or not end:
+        raise ValueError('start and end are required')
+
+    return parse_bounds(start, end)
+
+
+# Праздники за диапазон: ?start=&end=[&department=1&department=2]
+class HolidayApiView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @method_decorator(condition(etag_func=holidays_etag))
+    def get(self, request):
+        try:
+            range_start, range_end = range_params(request)
+            department_ids = [int(value) for value in request.query_params.getlist('department')]
+        except ValueError as e:
+            return Response({'success': False, 'message': str(e)}, status=400)
+
+        holidays = holidays_in_range(range_start, range_end, department_ids)
+        return Response(HolidaySerializer(holidays, many=True).data)
+
+
+# Праздники отдела текущего пользователя
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@condition(etag_func=department_etag)
+def get_holiday(request):
+    try:
+        range_start, range_end = range_params(request)
+    except ValueError as e:
+        return Response({'success': False, 'message': str(e)}, status=400)
+
+    holidays = holidays_in_range(range_start, range_end, [request.user.profile.department_id])
+    return Response(HolidaySerializer(holidays, many=True).data)
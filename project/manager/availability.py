@@ -0,0 +1,192 @@
+import heapq
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+
+DAY_START = time(0, 0)
+ALL_DAYS = [0, 1, 2, 3, 4, 5, 6]
+
+OFF_HOURS_COLOR = '#1c1c1c'
+PERSONAL_HOURS_COLOR = '#585858'
+VACATION_COLOR = '#363636'
+HOLIDAY_COLOR = '#363636'
+
+
+def merge_intervals(intervals):
+    # сортируем и склеиваем пересекающиеся и соседние интервалы
+    merged = []
+
+    for start, end in sorted(intervals):
+        if start >= end:
+            continue
+
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+
+    return merged
+
+
+def union_intervals(interval_lists):
+    # sweep line по уже склеенным и отсортированным спискам: heapq.merge - общий порядок за n*log(k),
+    # дальше один проход, как в merge_intervals, но без полной сортировки
+    merged = []
+
+    for start, end in heapq.merge(*interval_lists):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+
+    return merged
+
+
+def clip_intervals(intervals, range_start, range_end):
+    return [(max(start, range_start), min(end, range_end))
+            for start, end in intervals
+            if start < range_end and end > range_start]
+
+
+def subtract_intervals(intervals, blocked):
+    # intervals и blocked должны быть уже склеены и отсортированы
+    result = []
+    i = 0
+
+    for start, end in intervals:
+        while i < len(blocked) and blocked[i][1] <= start:
+            i += 1
+
+        j = i
+        current = start
+        while j < len(blocked) and blocked[j][0] < end:
+            if blocked[j][0] > current:
+                result.append((current, blocked[j][0]))
+            current = max(current, blocked[j][1])
+            j += 1
+
+        if current < end:
+            result.append((current, end))
+
+    return result
+
+
+def _time_to_str(value):
+    return value.strftime('%H:%M:%S')
+
+
+# Рабочее/личное время пользователя, отпуска и праздники отдела в виде интервалов.
+# Расписание одинаково каждый день, поэтому хранится как интервалы внутри суток
+# и разворачивается в даты только по запросу.
+class UserAvailability:
+    def __init__(self, user_id, schedule=None, vacations=(), holidays=()):
+        self.user_id = str(user_id)
+        self.schedule = schedule
+
+        # отпуск включает date_end целиком
+        self.vacations = merge_intervals(
+            (datetime.combine(v.date_start, DAY_START),
+             datetime.combine(v.date_end + timedelta(days=1), DAY_START))
+            for v in vacations
+        )
+        self.holidays = merge_intervals(
+            (_naive(h.date_time_start), _naive(h.date_time_end))
+            for h in holidays
+        )
+
+    def daily_blocked(self):
+        # интервалы внутри суток в виде (time, time), time.max - конец суток
+        if not self.schedule:
+            return [], []
+
+        off_hours = []
+        if self.schedule.work_hours_start > DAY_START:
+            off_hours.append((DAY_START, self.schedule.work_hours_start))
+        if self.schedule.work_hours_end < time.max:
+            off_hours.append((self.schedule.work_hours_end, time.max))
+
+        personal = []
+        if self.schedule.personal_hours_start and self.schedule.personal_hours_end:
+            personal.append((self.schedule.personal_hours_start, self.schedule.personal_hours_end))
+
+        return off_hours, personal
+
+    def recurring_rules(self):
+        # по одному правилу на интервал вместо событий на каждый день диапазона
+        off_hours, personal = self.daily_blocked()
+        rules = []
+
+        for intervals, color in ((off_hours, OFF_HOURS_COLOR), (personal, PERSONAL_HOURS_COLOR)):
+            for start, end in intervals:
+                rules.append({
+                    'start': _time_to_str(start),
+                    'end': '24:00:00' if end == time.max else _time_to_str(end),
+                    'dow': ALL_DAYS,
+                    'rendering': 'background',
+                    'backgroundColor': color,
+                    'user_id': self.user_id,
+                })
+
+        return rules
+
+    def absence_intervals(self, range_start, range_end):
+        return merge_intervals(
+            clip_intervals(self.vacations, range_start, range_end) +
+            clip_intervals(self.holidays, range_start, range_end)
+        )
+
+    def absence_events(self, range_start, range_end):
+        events = []
+
+        for intervals, color in ((self.vacations, VACATION_COLOR), (self.holidays, HOLIDAY_COLOR)):
+            for start, end in clip_intervals(intervals, range_start, range_end):
+                events.append({
+                    'start': start.isoformat(),
+                    'end': end.isoformat(),
+                    'rendering': 'background',
+                    'backgroundColor': color,
+                    'user_id': self.user_id,
+                })
+
+        return events
+
+    def background_events(self, range_start, range_end):
+        return self.recurring_rules() + self.absence_events(range_start, range_end)
+
+    def blocked_intervals(self, range_start, range_end):
+        # нерабочее и личное время, отпуска и праздники, склеенные в один список
+        off_hours, personal = self.daily_blocked()
+        daily = off_hours + personal
+        blocked = self.absence_intervals(range_start, range_end)
+
+        if daily:
+            day = range_start.date()
+            while day <= range_end.date():
+                for start, end in daily:
+                    day_end = day + timedelta(days=1) if end == time.max else day
+                    blocked.append((datetime.combine(day, start),
+                                    datetime.combine(day_end, DAY_START if end == time.max else end)))
+                day += timedelta(days=1)
+        elif not self.schedule:
+            # без расписания пользователь недоступен
+            blocked.append((range_start, range_end))
+
+        return merge_intervals(clip_intervals(blocked, range_start, range_end))
+
+    def free_intervals(self, range_start, range_end):
+        return subtract_intervals([(range_start, range_end)],
+                                  self.blocked_intervals(range_start, range_end))
+
+
+def _naive(value):
+    # календарь работает в наивном времени, как и get_tasks
+    if timezone.is_aware(value):
+        return timezone.make_naive(value)
+    return value
+
+
+def parse_range(start, end):
+    return _naive(datetime.fromisoformat(start)), _naive(datetime.fromisoformat(end))
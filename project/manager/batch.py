@@ -0,0 +1,113 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import changes, tree
+from .conflicts import check_conflicts
+from .models import Task, TaskChange
+
+
+MAX_BATCH_TASKS = 1000
+# сдвиг сроков за один раз; больше - почти наверняка ошибка ввода
+MAX_SHIFT = timedelta(days=366)
+OPERATIONS = ('reassign', 'reschedule', 'status', 'delete')
+
+
+def can_edit(user, task):
+    # как в edit_task: автор или исполнитель; staff - любые задачи
+    return user.is_staff or user.profile.id in (task['created_by_id'], task['managed_by_id'])
+
+
+def run_batch(user, task_ids, operation, value=None):
+    # value: id исполнителя для reassign, timedelta для reschedule, id статуса для status
+    if operation not in OPERATIONS:
+        raise ValueError(f'Unknown operation: {operation}')
+
+    if operation == 'reschedule' and abs(value) > MAX_SHIFT:
+        raise ValueError(f'Shift must be within {MAX_SHIFT.days} days')
+
+    # проверка и UPDATE в одной транзакции под блокировкой строк: иначе параллельная правка
+    # между ними оставит в TaskChange устаревшего прежнего исполнителя
+    with transaction.atomic():
+        return _run_batch(user, list(dict.fromkeys(task_ids)), operation, value)
+
+
+def _run_batch(user, task_ids, operation, value):
+    tasks = {
+        row['id']: row
+        for row in Task.objects.select_for_update().filter(id__in=task_ids)
+        .values('id', 'created_by_id', 'managed_by_id', 'head_task_id', 'deadline')
+    }
+
+    errors = {}
+    allowed = []
+    for task_id in task_ids:
+        task = tasks.get(task_id)
+        if task is None:
+            errors[task_id] = 'Task not found'
+        elif not can_edit(user, task):
+            errors[task_id] = 'Forbidden'
+        else:
+            allowed.append(task)
+
+    # проверка расписаний одним набором запросов на всю пачку
+    if operation == 'reassign':
+        checked = allowed
+        pairs = [(value, task['deadline']) for task in checked]
+    elif operation == 'reschedule':
+        checked = []
+        for task in allowed:
+            try:
+                task['new_deadline'] = task['deadline'] + value
+            except OverflowError:
+                errors[task['id']] = 'Deadline out of range'
+                continue
+            if task['managed_by_id']:
+                checked.append(task)
+        pairs = [(task['managed_by_id'], task['new_deadline']) for task in checked]
+    else:
+        checked, pairs = [], []
+
+    for task, conflict in zip(checked, check_conflicts(pairs)):
+        if conflict:
+            errors[task['id']] = conflict
+
+    allowed = [task for task in allowed if task['id'] not in errors]
+    if allowed:
+        apply(operation, allowed, value)
+
+    results = []
+    for task_id in task_ids:
+        if task_id in errors:
+            results.append({'id': task_id, 'success': False, 'message': errors[task_id]})
+        else:
+            results.append({'id': task_id, 'success': True})
+    return results
+
+
+def apply(operation, tasks, value):
+    # один UPDATE/DELETE на пачку; queryset.update() не вызывает сигналы - их работу делаем здесь
+    ids = [task['id'] for task in tasks]
+
+    if operation == 'delete':
+        tree.delete_subtrees(ids)
+        return
+
+    queryset = Task.objects.filter(id__in=ids)
+    now = timezone.now()
+
+    if operation == 'reassign':
+        queryset.update(managed_by_id=value, updated_at=now)
+        rows = [(task['id'], value, task['managed_by_id'], TaskChange.UPDATED) for task in tasks]
+    else:
+        if operation == 'reschedule':
+            queryset.update(deadline=F('deadline') + value, updated_at=now)
+        else:
+            queryset.update(status_id=value, updated_at=now)
+        rows = [(task['id'], task['managed_by_id'], None, TaskChange.UPDATED) for task in tasks]
+        # сроки и статусы входят в сводки предков
+        tree.refresh_rollups({task['head_task_id'] for task in tasks})
+
+    changes.tasks_changed(rows)
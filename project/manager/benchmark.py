@@ -0,0 +1,264 @@
+import random
+import statistics
+import time as timer
+import traceback
+import tracemalloc
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import freebusy, models, search, tags, tree
+
+
+STATUSES = ['new', 'in progress', 'review', 'done']
+CATEGORIES = ['dev', 'ops', 'hr', 'sales', 'support']
+SUBCATEGORIES = ['bug', 'feature', 'meeting', 'report']
+FOR_WHAT = ['client', 'internal', 'release']
+
+RANGES = {
+    'week': timedelta(days=7),
+    'month': timedelta(days=31),
+    'year': timedelta(days=365),
+}
+
+# свой кэш в памяти процесса вместо общего; с 300 записями по умолчанию прогретый прогон на 100
+# пользователях вытесняет свои же ключи и меряет промахи
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }
+}
+
+
+def generate_data(departments=5, users=100, tasks=5000, seed=42, start=date(2025, 1, 6)):
+    # детерминированный набор данных: одинаковый seed - одинаковые строки
+    rnd = random.Random(seed)
+    base = datetime.combine(start, time(0, 0))
+
+    department_objs = models.Department.objects.bulk_create(
+        [models.Department(name=f'Department {i}') for i in range(departments)]
+    )
+
+    django_users = User.objects.bulk_create([
+        User(username=f'bench{i}', first_name=f'First{i}', last_name=f'Last{i}')
+        for i in range(users)
+    ])
+    profiles = models.CustomUser.objects.bulk_create([
+        models.CustomUser(django_user=django_user,
+                          department=department_objs[i % departments],
+                          job_title=rnd.choice(['developer', 'manager', 'analyst']),
+                          telegram_username=f'@bench{i}')
+        for i, django_user in enumerate(django_users)
+    ])
+
+    schedules = models.UserSchedule.objects.bulk_create([
+        models.UserSchedule(user=profile,
+                            work_hours_start=time(rnd.choice([8, 9, 10]), 0),
+                            work_hours_end=time(rnd.choice([17, 18, 19]), 0),
+                            personal_hours_start=time(13, 0),
+                            personal_hours_end=time(14, 0))
+        for profile in profiles
+    ])
+
+    vacations = []
+    for schedule in schedules:
+        day = start - timedelta(days=rnd.randint(0, 60))
+        for _ in range(4):
+            day += timedelta(days=rnd.randint(30, 120))
+            vacations.append(models.Vacation(user_schedule=schedule,
+                                             date_start=day,
+                                             date_end=day + timedelta(days=rnd.randint(0, 13)),
+                                             tag='vacation'))
+            day += timedelta(days=14)
+    models.Vacation.objects.bulk_create(vacations)
+
+    for i in range(12):
+        holiday = models.Holiday.objects.create(
+            name=f'Holiday {i}',
+            date_time_start=timezone.make_aware(base + timedelta(days=30 * i)),
+            date_time_end=timezone.make_aware(base + timedelta(days=30 * i + 1)),
+        )
+        holiday.department.set(rnd.sample(department_objs, k=max(1, departments // 2)))
+
+    status_objs = [models.Status.objects.get_or_create(name=name)[0] for name in STATUSES]
+    tag_objs = models.Tag.objects.bulk_create([
+        models.Tag(category=category, subcategory=subcategory, for_what=for_what)
+        for category in CATEGORIES
+        for subcategory in SUBCATEGORIES
+        for for_what in FOR_WHAT
+    ])
+
+    def random_task(head_task=None):
+        day = rnd.randint(-30, 365)
+        deadline = base + timedelta(days=day, hours=rnd.randint(9, 17), minutes=rnd.choice([0, 30]))
+        return models.Task(head_task=head_task,
+                           title=f'Task {rnd.randint(0, 10 ** 6)}',
+                           assigned_by=rnd.choice(profiles),
+                           managed_by=rnd.choice(profiles),
+                           created_by=rnd.choice(profiles),
+                           priority=rnd.random() < 0.3,
+                           deadline=timezone.make_aware(deadline),
+                           status=rnd.choice(status_objs),
+                           tag=rnd.choice(tag_objs))
+
+    # примерно каждая пятая задача - подзадача
+    head_count = tasks - tasks // 5
+    heads = models.Task.objects.bulk_create([random_task() for _ in range(head_count)], batch_size=1000)
+    models.Task.objects.bulk_create([random_task(rnd.choice(heads)) for _ in range(tasks - head_count)],
+                                    batch_size=1000)
+    # bulk_create не вызывает save() и сигналы
+    search.reindex(models.Task.objects.all())
+    tags.recount()
+    tree.rebuild_rollups()
+
+    return profiles
+
+
+def measure(func, repeat=5, setup=None):
+    timings = []
+    queries = 0
+
+    for _ in range(repeat):
+        if setup:
+            setup()
+
+        with CaptureQueriesContext(connection) as context:
+            started = timer.perf_counter()
+            func()
+            timings.append(timer.perf_counter() - started)
+
+        queries = len(context.captured_queries)
+
+    return {
+        'min_ms': round(min(timings) * 1000, 3),
+        'median_ms': round(statistics.median(timings) * 1000, 3),
+        'max_ms': round(max(timings) * 1000, 3),
+        'queries': queries,
+        'repeat': repeat,
+    }
+
+
+def response_body(response):
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+def payload_size(view):
+    # размер тела и пик памяти на построение и отдачу ответа (кэш уже прогрет)
+    tracemalloc.start()
+    try:
+        size = len(response_body(view()))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {'bytes': size, 'peak_memory_bytes': peak}
+
+
+def run_benchmarks(profiles, repeat=5, start=date(2025, 1, 6)):
+    from django.contrib import admin
+    from .forms import AddUserVacation, validate_task_time_for_user
+    from .views import get_tasks, search_tasks, tag_facets
+
+    factory = RequestFactory()
+    results = {}
+
+    def safe(name, func, setup=None):
+        # остальные замеры продолжаем, но сломанный путь не выглядит результатом: команда завершится ошибкой
+        try:
+            results[name] = measure(func, repeat, setup)
+        except Exception as e:
+            results[name] = {'failed': True, 'error': f'{e.__class__.__name__}: {e}',
+                             'traceback': traceback.format_exc()}
+
+    def check_warm(cold, warm):
+        # прогретый прогон обязан обходиться меньшим числом запросов, иначе кэш не работает
+        if results[cold].get('failed') or results[warm].get('failed'):
+            return
+        if results[warm]['queries'] >= results[cold]['queries']:
+            results[warm].update(failed=True, error=f'Warm run issued {results[warm]["queries"]} queries, '
+                                                    f'cold run {results[cold]["queries"]}: cache misses')
+
+    owner = profiles[0]
+    range_start = datetime.combine(start, time(0, 0))
+
+    for users in (1, 10, 100):
+        selected = [str(profile.id) for profile in profiles[:users]]
+
+        for range_name, length in RANGES.items():
+            request = factory.get('/tasks/', {
+                'start': range_start.isoformat(),
+                'end': (range_start + length).isoformat(),
+                'users[]': selected,
+            })
+            request.user = owner.django_user
+
+            compact = factory.get('/tasks/', {
+                'start': range_start.isoformat(),
+                'end': (range_start + length).isoformat(),
+                'users[]': selected,
+                'format': 'compact',
+            })
+            compact.user = owner.django_user
+
+            cold = f'get_tasks[users={users},range={range_name}]'
+            warm = f'get_tasks_cached[users={users},range={range_name}]'
+            safe(cold, lambda: get_tasks(request), cache.clear)
+            safe(warm, lambda: get_tasks(request))
+            check_warm(cold, warm)
+            safe(f'get_tasks_compact_cached[users={users},range={range_name}]',
+                 lambda: response_body(get_tasks(compact)))
+            results[f'payload[users={users},range={range_name}]'] = {
+                'json': payload_size(lambda: get_tasks(request)),
+                'compact': payload_size(lambda: get_tasks(compact)),
+            }
+
+    deadline = timezone.make_aware(range_start + timedelta(days=2, hours=11))
+    safe('validate_task_time_for_user', lambda: validate_task_time_for_user(owner, deadline))
+
+    def vacation_clean():
+        form = AddUserVacation({'date_start': '2025-03-01', 'date_end': '2025-03-10', 'tag': 'vacation'},
+                               user_schedule=owner.schedule)
+        form.is_valid()
+
+    safe('AddUserVacation.clean', vacation_clean)
+
+    for name, params in (('text', {'q': 'dev bug'}), ('text_filtered', {'q': 'client', 'status': 'new'})):
+        request = factory.get('/tasks/search/', params)
+        request.user = owner.django_user
+        safe(f'search_tasks[{name}]', lambda request=request: search_tasks(request))
+
+    for users in (10, 100):
+        user_ids = [str(profile.id) for profile in profiles[:users]]
+        safe(f'find_availability[users={users},range=quarter]',
+             lambda user_ids=user_ids: freebusy.find_availability(user_ids, range_start,
+                                                                  range_start + timedelta(days=91),
+                                                                  timedelta(hours=1)))
+
+    head_task = models.Task.objects.filter(head_task=None, subtasks__isnull=False).first()
+    safe('load_tree', lambda: tree.load_tree(head_task.id))
+
+    request = factory.get('/tasks/tags/')
+    request.user = owner.django_user
+    safe('tag_facets', lambda: tag_facets(request))
+
+    superuser = User.objects.create_superuser(username='bench_admin', password='bench')
+    for model in (models.Task, models.Notification, models.UserSchedule, models.Vacation, models.Tag):
+        model_admin = admin.site._registry[model]
+        request = factory.get(f'/admin/manager/{model._meta.model_name}/')
+        request.user = superuser
+
+        def changelist(model_admin=model_admin, request=request):
+            model_admin.changelist_view(request).render()
+
+        safe(f'admin_changelist[{model._meta.model_name}]', changelist)
+
+    return results
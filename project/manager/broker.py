@@ -0,0 +1,84 @@
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class BaseBroker:
+    def publish(self, user_ids, message):
+        raise NotImplementedError
+
+    def subscribe(self, user_ids):
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+
+class Subscription:
+    def __init__(self, user_ids, maxsize=100):
+        self.user_ids = set(user_ids)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # медленный клиент: пропускаем, следующее событие всё равно вызовет синхронизацию
+            pass
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class InMemoryBroker(BaseBroker):
+    # рассылка внутри одного процесса; для нескольких воркеров нужен общий бэкенд
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = defaultdict(set)
+
+    def publish(self, user_ids, message):
+        with self.lock:
+            targets = set()
+            for user_id in user_ids:
+                targets |= self.subscriptions.get(str(user_id), set())
+
+        # publish вызывается из синхронных view в другом потоке
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, message)
+            except RuntimeError:
+                # цикл событий клиента уже закрыт
+                self.unsubscribe(subscription)
+
+    def subscribe(self, user_ids):
+        subscription = Subscription([str(user_id) for user_id in user_ids])
+
+        with self.lock:
+            for user_id in subscription.user_ids:
+                self.subscriptions[user_id].add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for user_id in subscription.user_ids:
+                self.subscriptions[user_id].discard(subscription)
+                if not self.subscriptions[user_id]:
+                    del self.subscriptions[user_id]
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+
+    if _broker is None:
+        backend = getattr(settings, 'TASK_EVENTS_BROKER', 'manager.broker.InMemoryBroker')
+        _broker = import_string(backend)()
+
+    return _broker
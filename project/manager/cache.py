@@ -0,0 +1,134 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+CALENDAR_CACHE_ALIAS = getattr(settings, 'CALENDAR_CACHE_ALIAS', 'default')
+CALENDAR_CACHE_TIMEOUT = getattr(settings, 'CALENDAR_CACHE_TIMEOUT', 60 * 60)
+
+
+def get_cache():
+    return caches[CALENDAR_CACHE_ALIAS]
+
+
+def version_key(user_id):
+    return f'calendar:version:{user_id}'
+
+
+def events_key(user_id, version, start, end):
+    return f'calendar:events:{user_id}:{version}:{start}:{end}'
+
+
+def _initial_version():
+    # если ключ версии вытеснен из кэша, новое значение не должно совпасть со старым
+    return time.time_ns() // 1000
+
+
+def get_versions(user_ids):
+    cache = get_cache()
+    keys = {version_key(user_id): str(user_id) for user_id in user_ids}
+    found = cache.get_many(keys.keys())
+
+    versions = {}
+    for key, user_id in keys.items():
+        version = found.get(key)
+        if version is None:
+            version = _initial_version()
+            if not cache.add(key, version, timeout=None):
+                version = cache.get(key, version)
+        versions[user_id] = version
+
+    return versions
+
+
+def _bump(user_ids):
+    cache = get_cache()
+
+    for user_id in user_ids:
+        key = version_key(user_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_version(), timeout=None)
+
+
+def bump_versions(user_ids):
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+
+    # до коммита другие воркеры ещё видят старые данные
+    if user_ids:
+        transaction.on_commit(lambda: _bump(user_ids))
+
+
+def get_user_events(user_ids, start, end):
+    # возвращает события из кэша по user_id (промахи отсутствуют) и версии пользователей
+    versions = get_versions(user_ids)
+    keys = {events_key(user_id, version, start, end): user_id
+            for user_id, version in versions.items()}
+    found = get_cache().get_many(keys.keys())
+
+    return {keys[key]: events for key, events in found.items()}, versions
+
+
+def set_user_events(events_by_user, versions, start, end):
+    data = {
+        events_key(user_id, versions[user_id], start, end): events
+        for user_id, events in events_by_user.items()
+    }
+    get_cache().set_many(data, timeout=CALENDAR_CACHE_TIMEOUT)
+
+
+# праздники кэшируются по отделу: один расчёт на всех сотрудников отдела
+HOLIDAYS_VERSION = 'holidays'
+
+
+def department_key(department_id):
+    return f'department:{department_id}'
+
+
+def holidays_key(department_id, version, start, end):
+    return f'calendar:holidays:{department_id}:{version}:{start}:{end}'
+
+
+def user_department_key(user_id, version):
+    return f'calendar:department:{user_id}:{version}'
+
+
+def get_user_departments(versions):
+    # отдел пользователя под его версией: смена отдела (сохранение профиля) поднимает версию
+    keys = {user_department_key(user_id, version): user_id for user_id, version in versions.items()}
+    found = get_cache().get_many(keys.keys())
+
+    return {keys[key]: department_id for key, department_id in found.items()}
+
+
+def set_user_departments(departments, versions):
+    get_cache().set_many({
+        user_department_key(user_id, versions[user_id]): department_id
+        for user_id, department_id in departments.items()
+    }, timeout=CALENDAR_CACHE_TIMEOUT)
+
+
+def bump_departments(department_ids):
+    # общая версия праздников - для ETag в API
+    bump_versions([department_key(department_id) for department_id in department_ids] + [HOLIDAYS_VERSION])
+
+
+def get_department_holidays(department_ids, start, end):
+    versions = get_versions([department_key(department_id) for department_id in department_ids])
+    versions = {department_id: versions[department_key(department_id)] for department_id in department_ids}
+    keys = {holidays_key(department_id, version, start, end): department_id
+            for department_id, version in versions.items()}
+    found = get_cache().get_many(keys.keys())
+
+    return {keys[key]: events for key, events in found.items()}, versions
+
+
+def set_department_holidays(events_by_department, versions, start, end):
+    data = {
+        holidays_key(department_id, versions[department_id], start, end): events
+        for department_id, events in events_by_department.items()
+    }
+    get_cache().set_many(data, timeout=CALENDAR_CACHE_TIMEOUT)
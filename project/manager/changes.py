@@ -0,0 +1,113 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from . import broker, cache, models
+from .events import TASK_EVENT_FIELDS, task_events
+
+
+# сколько изменений отдаём за раз; больше - клиенту проще перезагрузить диапазон
+MAX_CHANGES = 500
+
+# id выдаются до коммита, поэтому транзакция с меньшим id может закоммититься позже
+# уже прочитанной; перечитываем небольшое окно, повторы на клиенте идемпотентны
+OVERLAP = 50
+
+# сколько хранится журнал; клиент с более старым токеном перезагружает диапазон целиком
+RETENTION = timedelta(days=getattr(settings, 'TASK_CHANGE_RETENTION_DAYS', 7))
+
+
+def record_changes(changes):
+    # changes: [(task_id, managed_by_id, previous_managed_by_id, action)]
+    models.TaskChange.objects.bulk_create([
+        models.TaskChange(task_id=task_id,
+                          managed_by_id=managed_by_id,
+                          previous_managed_by_id=previous_managed_by_id,
+                          action=action)
+        for task_id, managed_by_id, previous_managed_by_id, action in changes
+    ])
+
+
+def tasks_changed(rows):
+    # rows: [(task_id, managed_by_id, previous_managed_by_id, action)]
+    # то же, что делают сигналы Task; массовые операции в обход save()/delete() вызывают напрямую
+    cache.bump_versions({user_id for row in rows for user_id in row[1:3]})
+    record_changes(rows)
+
+    if len(rows) == 1:
+        task_id, managed_by_id, previous_managed_by_id, action = rows[0]
+        publish_task_event([managed_by_id, previous_managed_by_id], task_id, action)
+    elif rows:
+        # массовая операция - одно сообщение на всех, клиент всё равно забирает дельту из /tasks/changes/
+        publish_batch_event({user_id for row in rows for user_id in row[1:3]}, len(rows))
+
+
+def publish_task_event(user_ids, task_id, action):
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    message = {'type': 'task', 'action': action, 'task_id': task_id}
+
+    if user_ids:
+        transaction.on_commit(lambda: broker.get_broker().publish(user_ids, message))
+
+
+def publish_batch_event(user_ids, count):
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    message = {'type': 'batch', 'count': count}
+
+    if user_ids:
+        transaction.on_commit(lambda: broker.get_broker().publish(user_ids, message))
+
+
+def current_token():
+    return models.TaskChange.objects.aggregate(token=Max('id'))['token'] or 0
+
+
+def token_expired(since):
+    # записи после since могли быть удалены prune_changes
+    oldest = models.TaskChange.objects.aggregate(oldest=Min('id'))['oldest']
+    return oldest is not None and since < oldest - 1
+
+
+def prune_changes(now=None):
+    cutoff = (now or timezone.now()) - RETENTION
+    first_kept = (models.TaskChange.objects.filter(created_at__gte=cutoff)
+                  .order_by('id').values_list('id', flat=True).first())
+    if first_kept is None:
+        # последнюю запись оставляем всегда: по ней token_expired видит, где кончается удалённое
+        first_kept = current_token()
+
+    return models.TaskChange.objects.filter(id__lt=first_kept).delete()[0]
+
+
+def load_changes(user_ids, since):
+    rows = list(
+        models.TaskChange.objects.filter(
+            Q(managed_by_id__in=user_ids) | Q(previous_managed_by_id__in=user_ids),
+            id__gt=max(since - OVERLAP, 0),
+        ).order_by('id').values_list('id', 'task_id')[:MAX_CHANGES + 1]
+    )
+
+    if len(rows) > MAX_CHANGES:
+        return {'token': current_token(), 'reset': True, 'events': [], 'deleted': []}
+
+    token = max([since] + [change_id for change_id, task_id in rows])
+    task_ids = {task_id for change_id, task_id in rows}
+
+    # актуальное состояние задач; всё, что удалено или ушло другому - надгробие
+    tasks = models.Task.objects.filter(
+        id__in=task_ids,
+        managed_by_id__in=user_ids,
+    ).values(*TASK_EVENT_FIELDS)
+
+    events = task_events(tasks)
+    alive = {int(event['id']) for event in events}
+
+    return {
+        'token': token,
+        'reset': False,
+        'events': events,
+        'deleted': [str(task_id) for task_id in sorted(task_ids - alive)],
+    }
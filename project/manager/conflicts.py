@@ -0,0 +1,78 @@
+from collections import defaultdict
+
+from .models import CustomUser, Holiday, UserSchedule, Vacation
+
+
+# предел пар за один запрос к check_task_conflicts
+MAX_CONFLICT_PAIRS = 1000
+
+
+def _user_id(user):
+    return user.pk if isinstance(user, CustomUser) else int(user)
+
+
+def check_conflicts(pairs):
+    # pairs: [(CustomUser или id, deadline)] -> [причина конфликта или None] в том же порядке
+    pairs = [(_user_id(user), deadline) for user, deadline in pairs]
+    if not pairs:
+        return []
+
+    user_ids = {user_id for user_id, deadline in pairs}
+    deadlines = [deadline for user_id, deadline in pairs]
+    first_date = min(deadlines).date()
+    last_date = max(deadlines).date()
+
+    users = CustomUser.objects.select_related('django_user').in_bulk(user_ids)
+    schedules = {schedule.user_id: schedule
+                 for schedule in UserSchedule.objects.filter(user_id__in=user_ids)}
+
+    vacations = defaultdict(list)
+    for vacation in Vacation.objects.filter(
+        user_schedule__user_id__in=user_ids,
+        date_start__lte=last_date,
+        date_end__gte=first_date,
+    ).values('user_schedule__user_id', 'date_start', 'date_end').order_by('date_start'):
+        vacations[vacation['user_schedule__user_id']].append(vacation)
+
+    holidays = defaultdict(list)
+    for holiday in Holiday.objects.filter(
+        department__in={user.department_id for user in users.values()},
+        date_time_start__lte=max(deadlines),
+        date_time_end__gte=min(deadlines),
+    ).values('department', 'name', 'date_time_start', 'date_time_end'):
+        holidays[holiday['department']].append(holiday)
+
+    return [
+        _conflict(users.get(user_id), schedules.get(user_id), vacations[user_id], holidays, deadline)
+        for user_id, deadline in pairs
+    ]
+
+
+def _conflict(user, schedule, vacations, holidays, deadline):
+    if user is None:
+        return 'User not found'
+
+    if schedule is None:
+        return f'{user} schedule not found'
+
+    task_date = deadline.date()
+    task_time = deadline.time()
+
+    if task_time < schedule.work_hours_start or task_time > schedule.work_hours_end:
+        return (f'Work hours: {schedule.work_hours_start:%H:%M} - '
+                f'{schedule.work_hours_end:%H:%M}')
+
+    if schedule.personal_hours_start and schedule.personal_hours_end:
+        if schedule.personal_hours_start <= task_time <= schedule.personal_hours_end:
+            return (f'Personal time: {schedule.personal_hours_start:%H:%M} - '
+                    f'{schedule.personal_hours_end:%H:%M}')
+
+    for vacation in vacations:
+        if vacation['date_start'] <= task_date <= vacation['date_end']:
+            return f'Vacation: {vacation["date_start"]} - {vacation["date_end"]}'
+
+    for holiday in holidays[user.department_id]:
+        if holiday['date_time_start'] <= deadline <= holiday['date_time_end']:
+            return f'Holiday: {holiday["name"]}'
+
+    return None
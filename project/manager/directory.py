@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import CustomUser
+
+
+RECENT_LIMIT = getattr(settings, 'DIRECTORY_RECENT_LIMIT', 10)
+RECENT_TIMEOUT = 60 * 60 * 24 * 30
+# одинаковая сортировка на всех страницах: отделы идут подряд и не рвутся курсором
+DIRECTORY_ORDERING = ('department__name', 'department_id',
+                      'django_user__last_name', 'django_user__first_name', 'id')
+
+
+def recent_key(user_id):
+    return f'directory:recent:{user_id}'
+
+
+def remember_recent(user_id, profile_ids):
+    # последние выбранные коллеги - в начало, без повторов
+    recent = [int(profile_id) for profile_id in profile_ids]
+    recent += [profile_id for profile_id in cache.get(recent_key(user_id), []) if profile_id not in recent]
+    cache.set(recent_key(user_id), recent[:RECENT_LIMIT], RECENT_TIMEOUT)
+
+
+def get_recent(user_id):
+    recent = cache.get(recent_key(user_id), [])
+    if not recent:
+        return []
+
+    profiles = (CustomUser.objects.select_related('django_user', 'department')
+                .exclude(django_user_id=user_id)
+                .in_bulk(recent))
+    return [profiles[profile_id] for profile_id in recent if profile_id in profiles]
+
+
+def user_entry(profile):
+    return {
+        'id': profile.id,
+        'name': profile.django_user.get_full_name() or profile.django_user.username,
+        'username': profile.django_user.username,
+        'job_title': profile.job_title,
+    }
+
+
+def group_by_department(profiles):
+    # профили уже отсортированы по отделу - группы собираем за один проход
+    groups = []
+    for profile in profiles:
+        if not groups or groups[-1]['department']['id'] != profile.department_id:
+            groups.append({
+                'department': {'id': profile.department_id, 'name': profile.department.name},
+                'users': [],
+            })
+        groups[-1]['users'].append(user_entry(profile))
+    return groups
@@ -0,0 +1,140 @@
+import json
+from collections import defaultdict
+
+from . import models
+from .availability import UserAvailability, parse_range
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+TASK_EVENT_FIELDS = (
+    'id', 'title', 'deadline', 'status__name', 'managed_by_id',
+    'managed_by__django_user__first_name', 'managed_by__django_user__last_name',
+)
+
+# поля с немногими разными значениями: в компактном формате - индекс в общем словаре
+DICTIONARY_FIELDS = ('user_id', 'user_name', 'status', 'className', 'rendering', 'backgroundColor', 'dow')
+COMPACT_CHUNK_SIZE = 500
+
+
+def load_calendar_data(user_ids, start, end, start_date_only, end_date_only):
+    # три запроса на любое количество пользователей, группировка в памяти
+    tasks = defaultdict(list)
+    for task in models.Task.objects.filter(
+        managed_by_id__in=user_ids,
+        deadline__range=[start, end],
+    ).values(*TASK_EVENT_FIELDS):
+        tasks[str(task['managed_by_id'])].append(task)
+
+    schedules = {
+        str(schedule.user_id): schedule
+        for schedule in models.UserSchedule.objects.filter(user_id__in=user_ids)
+    }
+
+    vacations = defaultdict(list)
+    for vacation in models.Vacation.objects.filter(
+        user_schedule__user_id__in=user_ids,
+        date_end__gte=start_date_only,
+        date_start__lte=end_date_only,
+    ).select_related('user_schedule'):
+        vacations[str(vacation.user_schedule.user_id)].append(vacation)
+
+    return tasks, schedules, vacations
+
+
+def task_events(tasks):
+    events = []
+
+    for task in tasks:
+        status = task['status__name']
+        css_slug = status.replace(' ', '-').lower()
+
+        user_name = f"{task['managed_by__django_user__first_name']} {task['managed_by__django_user__last_name']}"
+
+        events.append({
+            'id': str(task['id']),
+            'title': f"{task['title']} ({user_name})",
+            'start': task['deadline'].isoformat(),
+            'end': task['deadline'].isoformat(),
+            'status': task['status__name'],
+            'className': 'status-' + css_slug,
+            'user_id': str(task['managed_by_id']),
+            'user_name': user_name
+        })
+
+    return events
+
+
+def build_events(user_ids, start, end, start_date_only, end_date_only):
+    tasks, schedules, vacations = load_calendar_data(user_ids, start, end,
+                                                     start_date_only, end_date_only)
+
+    range_start, range_end = parse_range(start, end)
+
+    events = {}
+    for user_id in user_ids:
+        user_events = task_events(tasks[user_id])
+
+        # без расписания фоновых событий нет
+        schedule = schedules.get(user_id)
+        if schedule:
+            availability = UserAvailability(user_id, schedule, vacations[user_id])
+            user_events += availability.background_events(range_start, range_end)
+
+        events[user_id] = user_events
+
+    return events
+
+
+def dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value).decode()
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+class CompactEncoder:
+    # событие -> [номер набора ключей, значения...]; повторяющиеся строки - номера в словарях
+    def __init__(self):
+        self.shapes = {}
+        self.values = {field: {} for field in DICTIONARY_FIELDS}
+
+    def row(self, event):
+        keys = tuple(event)
+        row = [self.shapes.setdefault(keys, len(self.shapes))]
+
+        for key in keys:
+            value = event[key]
+            if key in self.values:
+                index = self.values[key]
+                value = index.setdefault(tuple(value) if isinstance(value, list) else value, len(index))
+            row.append(value)
+
+        return row
+
+    def dictionaries(self):
+        return {
+            'shapes': [list(keys) for keys in self.shapes],
+            'values': {
+                field: [list(value) if isinstance(value, tuple) else value for value in index]
+                for field, index in self.values.items() if index
+            },
+        }
+
+
+def compact_stream(event_groups):
+    # {"rows": [...], "shapes": [...], "values": {...}} по кускам; словари известны только в конце
+    encoder = CompactEncoder()
+    separator = ''
+
+    yield '{"rows":['
+    for events in event_groups:
+        for offset in range(0, len(events), COMPACT_CHUNK_SIZE):
+            rows = [encoder.row(event) for event in events[offset:offset + COMPACT_CHUNK_SIZE]]
+            if rows:
+                yield separator + dumps(rows)[1:-1]
+                separator = ','
+
+    yield '],' + dumps(encoder.dictionaries())[1:]
@@ -1,12 +1,38 @@
 from django import forms
 from django.contrib.auth.forms import UserChangeForm
 from django.contrib.auth import get_user_model
-from .models import CustomUser, UserSchedule, Vacation, Task, Tag
-from datetime import datetime, time
+from django.urls import reverse_lazy
+from .models import CustomUser, UserSchedule, Vacation, Task
+from .conflicts import check_conflicts
 
 User = get_user_model()
 
 
+class LazySelect(forms.Select):
+    # в HTML только выбранный вариант; остальные подгружаются по data-autocomplete-url
+    def __init__(self, url, attrs=None):
+        super().__init__(attrs)
+        self.attrs['data-autocomplete-url'] = url
+
+    def optgroups(self, name, value, attrs=None):
+        selected = {str(v) for v in value if v not in (None, '')}
+        options = [self.create_option(name, '', '---------', not selected, 0)]
+
+        if selected:
+            field = self.choices.field
+            for index, obj in enumerate(self.choices.queryset.filter(pk__in=selected), 1):
+                options.append(self.create_option(name, field.prepare_value(obj),
+                                                  field.label_from_instance(obj), True, index))
+
+        return [(None, options, 0)]
+
+
+def lazy_task_fields(form):
+    # queryset остаётся полным для валидации, но рендерится только выбранное значение
+    form.fields['head_task'].queryset = Task.objects.select_related('status')
+    form.fields['managed_by'].queryset = CustomUser.objects.select_related('django_user')
+
+
 class DjangoUserChangeForm(UserChangeForm):
     class Meta:
         model = User
@@ -75,14 +101,16 @@ class AddUserVacation(forms.ModelForm):
 
         # проверка на пересечение с существующими записями
         if self.user_schedule:
-            existing_vacations = Vacation.objects.filter(user_schedule=self.user_schedule)
+            vacation = (Vacation.overlapping(self.user_schedule, date_start, date_end)
+                        .exclude(pk=self.instance.pk)
+                        .order_by('date_start')
+                        .first())
 
-            for vacation in existing_vacations:
-                if not (date_end < vacation.date_start or date_start > vacation.date_end):
-                    raise forms.ValidationError(
-                        f'The vacation intersects with an existing period: '
-                        f'{vacation.date_start} — {vacation.date_end}'
-                    )
+            if vacation:
+                raise forms.ValidationError(
+                    f'The vacation intersects with an existing period: '
+                    f'{vacation.date_start} — {vacation.date_end}'
+                )
 
         return cleaned_data
 
@@ -93,15 +121,21 @@ class CreateTaskForm(forms.ModelForm):
         fields = ('head_task', 'title', 'managed_by', 'priority', 'deadline')
         widgets = {
             'deadline': forms.DateTimeInput(attrs={'type': 'datetime-local', 'class': 'form-control'}),
+            'head_task': LazySelect(reverse_lazy('autocomplete_tasks')),
+            'managed_by': LazySelect(reverse_lazy('autocomplete_users')),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        lazy_task_fields(self)
+
     def clean(self):
         cleaned_data = super().clean()
         managed_by = cleaned_data.get('managed_by')
         deadline = cleaned_data.get('deadline')
 
         if managed_by and deadline:
-            validation_error = validate_task_time_for_user(managed_by, deadline)
+            validation_error = check_conflicts([(managed_by, deadline)])[0]
             if validation_error:
                 raise forms.ValidationError(validation_error)
 
@@ -114,15 +148,21 @@ class EditeTaskForm(forms.ModelForm):
         fields = ('head_task', 'title', 'managed_by', 'priority', 'deadline', 'status')
         widgets = {
             'deadline': forms.DateTimeInput(attrs={'type': 'datetime-local', 'class': 'form-control'}),
+            'head_task': LazySelect(reverse_lazy('autocomplete_tasks')),
+            'managed_by': LazySelect(reverse_lazy('autocomplete_users')),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        lazy_task_fields(self)
+
     def clean(self):
         cleaned_data = super().clean()
         managed_by = cleaned_data.get('managed_by')
         deadline = cleaned_data.get('deadline')
 
         if managed_by and deadline:
-            validation_error = validate_task_time_for_user(managed_by, deadline)
+            validation_error = check_conflicts([(managed_by, deadline)])[0]
             if validation_error:
                 raise forms.ValidationError(validation_error)
 
@@ -130,35 +170,17 @@ class EditeTaskForm(forms.ModelForm):
 
 
 def validate_task_time_for_user(user, deadline):
-    task_date = deadline.date()
-    task_time = deadline.time()
-
-    try:
-        user_schedule = UserSchedule.objects.get(user=user)
-
-        if task_time < user_schedule.work_hours_start or task_time > user_schedule.work_hours_end:
-            return f'Work hours: {user_schedule.work_hours_start.strftime('%H:%M')} - {user_schedule.work_hours_end.strftime('%H:%M')}'
+    return check_conflicts([(user, deadline)])[0]
 
-        if user_schedule.personal_hours_start and user_schedule.personal_hours_end:
-            if user_schedule.personal_hours_start <= task_time <= user_schedule.personal_hours_end:
-                return f'Personal time: {user_schedule.personal_hours_start.strftime('%H:%M')} - {user_schedule.personal_hours_end.strftime('%H:%M')}'
 
-        vacations = Vacation.objects.filter(
-            user_schedule__user=user,
-            date_start__lte=task_date,
-            date_end__gte=task_date
-        )
+class TagForm(forms.Form):
+    # не ModelForm: тег общий для задач (tags.intern), правка одной задачи не должна менять другие
+    category = forms.CharField(max_length=100, required=False)
+    subcategory = forms.CharField(max_length=100, required=False)
+    for_what = forms.CharField(max_length=100, required=False)
 
-        if vacations.exists():
-            vacation = vacations.first()
-            return f'Vacation: {vacation.date_start} - {vacation.date_end}'
-
-    except UserSchedule.DoesNotExist:
-        return f'{user} schedule not found'
-
-    return None
-
-class TagForm(forms.ModelForm):
-    class Meta:
-        model = Tag
-        fields = ('category', 'subcategory', 'for_what')
\ No newline at end of file
+    @classmethod
+    def for_tag(cls, tag, *args, **kwargs):
+        if tag is not None:
+            kwargs['initial'] = {'category': tag.category, 'subcategory': tag.subcategory, 'for_what': tag.for_what}
+        return cls(*args, **kwargs)
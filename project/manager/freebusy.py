@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .availability import UserAvailability, clip_intervals, merge_intervals, subtract_intervals, union_intervals
+from .events import load_calendar_data
+from .holidays import aware, load_department_holidays
+from .models import CustomUser
+
+
+# задача - точка (deadline); в календаре она занимает столько же по умолчанию
+TASK_BUSY_DURATION = timedelta(minutes=getattr(settings, 'AVAILABILITY_TASK_MINUTES', 60))
+MAX_USERS = getattr(settings, 'AVAILABILITY_MAX_USERS', 200)
+MAX_RANGE = timedelta(days=getattr(settings, 'AVAILABILITY_MAX_DAYS', 92))
+SLOT_LIMIT = 10
+
+
+def busy_intervals(user_ids, range_start, range_end):
+    # {user_id: склеенные занятые интервалы}; запросы - пачкой на всех пользователей
+    departments = dict(CustomUser.objects.filter(id__in=user_ids).values_list('id', 'department_id'))
+    missing = [user_id for user_id in user_ids if int(user_id) not in departments]
+    if missing:
+        raise ValueError(f'Users not found: {", ".join(missing)}')
+
+    tasks, schedules, vacations = load_calendar_data(user_ids, aware(range_start), aware(range_end),
+                                                     range_start.date(), range_end.date())
+    holidays = load_department_holidays(set(departments.values()), range_start, range_end)
+
+    busy = {}
+    for user_id in user_ids:
+        availability = UserAvailability(user_id, schedules.get(user_id), vacations[user_id],
+                                        holidays[departments[int(user_id)]])
+        deadlines = [timezone.make_naive(task['deadline']) for task in tasks[user_id]]
+        task_intervals = [(deadline, deadline + TASK_BUSY_DURATION) for deadline in deadlines]
+
+        busy[user_id] = merge_intervals(availability.blocked_intervals(range_start, range_end) +
+                                        clip_intervals(task_intervals, range_start, range_end))
+
+    return busy
+
+
+def find_availability(user_ids, range_start, range_end, duration, limit=SLOT_LIMIT):
+    busy = busy_intervals(user_ids, range_start, range_end)
+    whole_range = [(range_start, range_end)]
+
+    # общее свободное время - дополнение объединения занятости всех пользователей
+    common_free = subtract_intervals(whole_range, union_intervals(busy.values()))
+    slots = [(start, end) for start, end in common_free if end - start >= duration][:limit]
+
+    return {
+        'users': [
+            {
+                'user_id': user_id,
+                'busy': busy[user_id],
+                'free': subtract_intervals(whole_range, busy[user_id]),
+            }
+            for user_id in user_ids
+        ],
+        'slots': slots,
+    }
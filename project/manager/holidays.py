@@ -0,0 +1,95 @@
+from collections import defaultdict
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import cache
+from .availability import UserAvailability, parse_range
+from .models import CustomUser, Holiday
+
+
+def aware(value):
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+
+def parse_deadline(value):
+    # ISO-дата со временем или просто дата (полночь); без зоны - текущая зона; ValueError при ошибке
+    deadline = parse_datetime(value)
+    if deadline is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid deadline: {value}')
+        deadline = datetime.combine(day, time.min)
+
+    return aware(deadline)
+
+
+def parse_bounds(start, end):
+    # 'YYYY-MM-DD' или ISO-дата со временем; ValueError при ошибке
+    range_start, range_end = parse_range(start, end)
+    if range_end <= range_start:
+        raise ValueError('end must be after start')
+    return range_start, range_end
+
+
+def holidays_in_range(range_start, range_end, department_ids=None):
+    holidays = Holiday.objects.filter(
+        date_time_start__lt=aware(range_end),
+        date_time_end__gt=aware(range_start),
+    )
+    if department_ids:
+        holidays = holidays.filter(department__in=department_ids).distinct()
+
+    return holidays.prefetch_related('department').order_by('date_time_start', 'id')
+
+
+def load_department_holidays(department_ids, range_start, range_end):
+    # один запрос по связующей таблице на все отделы
+    holidays = defaultdict(list)
+    for link in Holiday.department.through.objects.filter(
+        department_id__in=department_ids,
+        holiday__date_time_start__lt=aware(range_end),
+        holiday__date_time_end__gt=aware(range_start),
+    ).select_related('holiday'):
+        holidays[link.department_id].append(link.holiday)
+
+    return holidays
+
+
+def department_events(department_ids, start, end):
+    # фоновые события праздников по отделам, промахи кэша считаем одной пачкой
+    cached, versions = cache.get_department_holidays(department_ids, start, end)
+    missed = [department_id for department_id in department_ids if department_id not in cached]
+
+    if missed:
+        range_start, range_end = parse_range(start, end)
+        holidays = load_department_holidays(missed, range_start, range_end)
+        computed = {
+            department_id: UserAvailability(None, holidays=holidays[department_id])
+            .absence_events(range_start, range_end)
+            for department_id in missed
+        }
+        cache.set_department_holidays(computed, versions, start, end)
+        cached.update(computed)
+
+    return cached
+
+
+def holiday_events(versions, start, end):
+    # versions: {user_id: версия} из cache.get_user_events -> {user_id: события праздников его отдела}
+    departments = cache.get_user_departments(versions)
+    missed = [user_id for user_id in versions if user_id not in departments]
+
+    if missed:
+        loaded = {str(user_id): department_id for user_id, department_id in
+                  CustomUser.objects.filter(id__in=missed).values_list('id', 'department_id')}
+        cache.set_user_departments(loaded, versions)
+        departments.update(loaded)
+
+    by_department = department_events(sorted(set(departments.values())), start, end)
+
+    return {
+        user_id: [{**event, 'user_id': user_id} for event in by_department[department_id]]
+        for user_id, department_id in departments.items()
+    }
@@ -0,0 +1,65 @@
+import json
+import subprocess
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from manager import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Runs seeded benchmarks of the manager hot paths on a throwaway test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departments', type=int, default=5)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--tasks', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--output', help='Write JSON results to this file instead of stdout')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep the test database between runs')
+
+    # общий кэш (Redis) не трогаем: cache.clear() его бы стёр, а ключи с id тестовой базы
+    # совпадают с id рабочей и могли бы отдаться настоящим пользователям
+    @override_settings(CACHES=benchmark.CACHES)
+    def handle(self, *args, **options):
+        # рабочую базу не трогаем: всё в тестовой, как у manage.py test
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+
+        try:
+            if options['keepdb']:
+                # схема остаётся, данные прошлого запуска - нет
+                call_command('flush', interactive=False, verbosity=0)
+            profiles = benchmark.generate_data(options['departments'], options['users'],
+                                               options['tasks'], options['seed'])
+            results = benchmark.run_benchmarks(profiles, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        report = json.dumps({
+            'commit': self.git_commit(),
+            'database': connection.vendor,
+            'params': {key: options[key] for key in ('departments', 'users', 'tasks', 'seed', 'repeat')},
+            'results': results,
+        }, indent=2)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(report)
+        else:
+            self.stdout.write(report)
+
+        failed = [name for name, result in results.items() if result.get('failed')]
+        if failed:
+            raise CommandError(f'Benchmarks failed: {", ".join(failed)}')
+
+    def git_commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
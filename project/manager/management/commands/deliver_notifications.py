@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from manager import notifications
+
+
+class Command(BaseCommand):
+    help = 'Delivers due notifications to Telegram in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds to sleep when there is nothing to send')
+        parser.add_argument('--once', action='store_true',
+                            help='Process a single batch and exit')
+
+    def handle(self, *args, **options):
+        transport = notifications.get_transport()
+
+        while True:
+            delivered, failed = notifications.run_once(transport,
+                                                       options['batch_size'],
+                                                       options['concurrency'])
+
+            if delivered or failed:
+                self.stdout.write(f'Delivered: {delivered}, failed: {failed}')
+
+            if options['once']:
+                break
+
+            # пустая очередь - ждём; полная пачка - сразу берём следующую
+            if delivered + failed < options['batch_size']:
+                time.sleep(options['interval'])
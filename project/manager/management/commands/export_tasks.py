@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from manager import transfer
+from manager.models import Task
+
+
+class Command(BaseCommand):
+    help = 'Exports all tasks as CSV, JSON array or JSON lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(transfer.WRITERS), default='csv')
+        parser.add_argument('--output', help='Write to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        writer, content_type = transfer.WRITERS[options['format']]
+        chunks = writer(transfer.export_rows(Task.objects.all()))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
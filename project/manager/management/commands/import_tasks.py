@@ -0,0 +1,42 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from manager import transfer
+from manager.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Imports tasks from a CSV, JSON array or JSON lines file in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File path or '-' for stdin")
+        parser.add_argument('--format', choices=sorted(transfer.READERS))
+        parser.add_argument('--batch-size', type=int, default=transfer.IMPORT_BATCH_SIZE)
+        parser.add_argument('--user', help='Username recorded as created_by')
+        parser.add_argument('--no-schedule-check', action='store_true',
+                            help='Skip work hours / vacation / holiday checks')
+
+    def handle(self, *args, **options):
+        created_by = None
+        if options['user']:
+            created_by = CustomUser.objects.filter(django_user__username=options['user']).first()
+            if created_by is None:
+                raise CommandError(f'User not found: {options["user"]}')
+
+        path = options['path']
+        file_format = options['format'] or transfer.guess_format(path)
+        importer = transfer.TaskImporter(created_by, options['batch_size'], not options['no_schedule_check'])
+
+        stream = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        try:
+            importer.run(transfer.READERS[file_format](stream))
+        except ValueError as e:
+            raise CommandError(f'{e} (created before the error: {importer.created})')
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+
+        for error in importer.errors:
+            self.stderr.write(f'Row {error["row"]}: {error["message"]}')
+        self.stdout.write(f'Tasks created: {importer.created}, failed: {importer.error_count}')
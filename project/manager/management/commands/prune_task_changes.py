@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from manager import changes
+
+
+class Command(BaseCommand):
+    help = 'Deletes task change log entries older than TASK_CHANGE_RETENTION_DAYS'
+
+    def handle(self, *args, **options):
+        count = changes.prune_changes()
+        self.stdout.write(f'Task changes deleted: {count}')
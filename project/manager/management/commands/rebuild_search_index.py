@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from manager import search
+from manager.models import Task
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the task full-text search documents and index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=search.REINDEX_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        search.get_backend().install()
+        count = search.reindex(Task.objects.all(), options['batch_size'])
+        self.stdout.write(f'Tasks indexed: {count}')
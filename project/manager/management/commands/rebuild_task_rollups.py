@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from manager import tree
+
+
+class Command(BaseCommand):
+    help = 'Recomputes subtask roll-ups (status counts, earliest deadline) for all tasks'
+
+    def handle(self, *args, **options):
+        count = tree.rebuild_rollups()
+        self.stdout.write(f'Roll-ups written: {count}')
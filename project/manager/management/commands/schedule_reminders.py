@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from manager.reminders import DeadlineScheduler
+
+
+class Command(BaseCommand):
+    help = 'Creates deadline reminder notifications for upcoming tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=30,
+                            help='Seconds between scheduler ticks')
+        parser.add_argument('--once', action='store_true',
+                            help='Run a single tick and exit')
+
+    def handle(self, *args, **options):
+        scheduler = DeadlineScheduler()
+
+        while True:
+            created = scheduler.tick(timezone.now())
+
+            if created:
+                self.stdout.write(f'Reminders created: {len(created)}')
+
+            if options['once']:
+                break
+
+            time.sleep(options['interval'])
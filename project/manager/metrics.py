@@ -0,0 +1,129 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class ViewStats:
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.duration = 0.0
+        self.queries = 0
+        self.db_duration = 0.0
+        self.response_bytes = 0
+        self.errors = 0
+
+
+class Registry:
+    # агрегаты на процесс; каждый воркер отдаёт свои, суммирует их сборщик метрик
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(ViewStats)
+
+    def observe(self, view, method, status, duration, queries, db_duration, response_bytes):
+        with self.lock:
+            stats = self.views[(view, method)]
+            stats.buckets[bisect_left(LATENCY_BUCKETS, duration)] += 1
+            stats.count += 1
+            stats.duration += duration
+            stats.queries += queries
+            stats.db_duration += db_duration
+            stats.response_bytes += response_bytes
+            if status >= 500:
+                stats.errors += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {key: vars(stats).copy() for key, stats in self.views.items()}
+
+    def render(self):
+        lines = []
+        snapshot = self.snapshot()
+
+        def add(name, kind, help_text, rows):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(rows)
+
+        def labels(view, method, **extra):
+            pairs = {'view': view, 'method': method, **extra}
+            return ','.join(f'{key}="{value}"' for key, value in pairs.items())
+
+        histogram = []
+        for (view, method), stats in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), stats['buckets']):
+                cumulative += count
+                histogram.append(f'http_request_duration_seconds_bucket{{{labels(view, method, le=bound)}}} {cumulative}')
+            histogram.append(f'http_request_duration_seconds_sum{{{labels(view, method)}}} {stats["duration"]:.6f}')
+            histogram.append(f'http_request_duration_seconds_count{{{labels(view, method)}}} {stats["count"]}')
+        add('http_request_duration_seconds', 'histogram', 'Request latency by URL name.', histogram)
+
+        counters = [
+            ('http_request_db_queries_total', 'queries', 'SQL queries issued by requests.', 'd'),
+            ('http_request_db_duration_seconds_total', 'db_duration', 'Time spent in SQL queries.', '.6f'),
+            ('http_response_size_bytes_total', 'response_bytes', 'Response body bytes (non-streaming).', 'd'),
+            ('http_request_errors_total', 'errors', 'Responses with 5xx status.', 'd'),
+        ]
+        for name, field, help_text, fmt in counters:
+            add(name, 'counter', help_text, [
+                f'{name}{{{labels(view, method)}}} {stats[field]:{fmt}}'
+                for (view, method), stats in sorted(snapshot.items())
+            ])
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match._func_path
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'METRICS_ENABLED', True)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        counter = QueryCounter()
+        started = time.perf_counter()
+
+        with connections['default'].execute_wrapper(counter):
+            response = self.get_response(request)
+
+        duration = time.perf_counter() - started
+        size = 0 if response.streaming else len(response.content)
+
+        registry.observe(view_name(request), request.method, response.status_code,
+                         duration, counter.count, counter.duration, size)
+
+        return response
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def schedule_existing(apps, schema_editor):
+    # старые записи - по их send_time; просроченные до появления воркера не рассылаем пачкой задним числом
+    Notification = apps.get_model('manager', 'Notification')
+    Notification.objects.update(next_attempt_at=models.F('send_time'))
+    Notification.objects.filter(send_time__lt=django.utils.timezone.now()).update(
+        status='failed',
+        last_error='Expired before delivery was enabled',
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0002_taskchange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='delivered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('delivered', 'Delivered'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(schedule_existing, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='manager_not_status_f24810_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:52
+
+import manager.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0003_notification_delivery'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='task',
+            name='deadline',
+            field=models.DateTimeField(db_index=True, default=manager.models.default_deadline),
+        ),
+    ]
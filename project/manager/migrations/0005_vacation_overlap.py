@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:53
+
+import manager.postgres
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0004_task_deadline_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vacation',
+            index=models.Index(fields=['user_schedule', 'date_start', 'date_end'], name='manager_vac_user_sc_2b52df_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='vacation',
+            constraint=manager.postgres.PostgresExclusionConstraint(expressions=[(manager.postgres.Int8Range('user_schedule', 'user_schedule', models.Value('[]')), '&&'), (manager.postgres.DateRange('date_start', 'date_end', models.Value('[]')), '&&')], name='vacation_no_overlap'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:55
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0006_profilereport'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='holiday',
+            name='date_time_start',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='send_time',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='type',
+            field=models.CharField(db_index=True, max_length=150),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='priority',
+            field=models.BooleanField(db_index=True, default=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:56
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+import manager.postgres
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0007_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=manager.postgres.PostgresIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('title'), name='text_pattern_ops'), name='task_title_prefix'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:57
+
+import django.contrib.postgres.search
+import manager.postgres
+from django.db import migrations, models
+from manager import search
+from manager.models import search_text
+
+
+BATCH_SIZE = 1000
+
+
+def fill_search_documents(apps, schema_editor):
+    # у существующих задач документ пустой: заполняем как search.reindex, но на исторических моделях
+    Task = apps.get_model('manager', 'Task')
+    backend = search.get_backend()
+    backend.install()
+    batch = []
+
+    def flush():
+        Task.objects.bulk_update(batch, ['search_document'])
+        backend.index(batch)
+        batch.clear()
+
+    for task in Task.objects.select_related('tag', 'head_task').order_by('pk').iterator(chunk_size=BATCH_SIZE):
+        task.search_document = search_text(task.title, task.tag, task.head_task.title if task.head_task else None)
+        batch.append(task)
+
+        if len(batch) >= BATCH_SIZE:
+            flush()
+
+    if batch:
+        flush()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0008_task_title_prefix'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='search_document',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='task',
+            index=manager.postgres.PostgresGinIndex(django.contrib.postgres.search.SearchVector('search_document', config='simple'), name='task_search_document'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0009_task_search_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='task_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
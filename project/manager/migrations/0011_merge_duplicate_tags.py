@@ -0,0 +1,47 @@
+import django.db.models.functions.comparison
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+# NULL и '' - одно и то же, как в ограничении tag_unique_triple
+FIELDS = ('category', 'subcategory', 'for_what')
+
+
+def merge_duplicate_tags(apps, schema_editor):
+    # раньше create_task создавал свой Tag на каждую задачу; оставляем строку с наименьшим id
+    Tag = apps.get_model('manager', 'Tag')
+    Task = apps.get_model('manager', 'Task')
+
+    survivor = (Tag.objects.annotate(**{f'{name}_key': Coalesce(name, Value('')) for name in FIELDS})
+                .filter(**{f'{name}_key': Coalesce(OuterRef(name), Value('')) for name in FIELDS})
+                .order_by('pk').values('pk')[:1])
+
+    duplicates = {}
+    for tag_id, survivor_id in (Tag.objects.annotate(survivor=Subquery(survivor))
+                                .exclude(survivor=models.F('pk')).values_list('pk', 'survivor')):
+        duplicates.setdefault(survivor_id, []).append(tag_id)
+
+    for survivor_id, tag_ids in duplicates.items():
+        Task.objects.filter(tag_id__in=tag_ids).update(tag_id=survivor_id)
+        Tag.objects.filter(pk__in=tag_ids).delete()
+
+    # как tags.recount(), но на исторических моделях
+    counts = (Task.objects.filter(tag=OuterRef('pk')).order_by()
+              .values('tag').annotate(count=Count('pk')).values('count'))
+    Tag.objects.update(task_count=Coalesce(Subquery(counts), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0010_tag_task_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_tags, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Coalesce('category', models.Value('')), django.db.models.functions.comparison.Coalesce('subcategory', models.Value('')), django.db.models.functions.comparison.Coalesce('for_what', models.Value('')), name='tag_unique_triple'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:59
+
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+NO_STATUS = 'none'
+
+
+def fill_rollups(apps, schema_editor):
+    # сводки для уже существующих деревьев: как tree.rebuild_rollups, но на исторических моделях
+    Task = apps.get_model('manager', 'Task')
+    TaskRollup = apps.get_model('manager', 'TaskRollup')
+
+    rows = list(Task.objects.values_list('id', 'head_task_id', 'status__name', 'deadline'))
+    parents = {task_id: head_task_id for task_id, head_task_id, status, deadline in rows}
+    rollups = {}
+
+    for task_id, head_task_id, status, deadline in rows:
+        seen = {task_id}
+        while head_task_id is not None and head_task_id in parents and head_task_id not in seen:
+            rollup = rollups.setdefault(head_task_id, {'descendants': 0, 'status_counts': Counter(),
+                                                       'earliest_deadline': None})
+            rollup['descendants'] += 1
+            rollup['status_counts'][status or NO_STATUS] += 1
+            if rollup['earliest_deadline'] is None or deadline < rollup['earliest_deadline']:
+                rollup['earliest_deadline'] = deadline
+
+            seen.add(head_task_id)
+            head_task_id = parents[head_task_id]
+
+    TaskRollup.objects.bulk_create([
+        TaskRollup(task_id=task_id, descendants=rollup['descendants'],
+                   status_counts=dict(rollup['status_counts']),
+                   earliest_deadline=rollup['earliest_deadline'])
+        for task_id, rollup in rollups.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0011_merge_duplicate_tags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskRollup',
+            fields=[
+                ('task', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rollup', serialize=False, to='manager.task')),
+                ('descendants', models.PositiveIntegerField(default=0)),
+                ('status_counts', models.JSONField(default=dict)),
+                ('earliest_deadline', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
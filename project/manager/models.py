@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from django.utils.html import strip_tags
 
@@ -54,7 +55,7 @@ class Holiday(models.Model):
     department = models.ManyToManyField(Department,
                                         related_name='holidays')
     name = models.CharField(max_length=255)
-    date_time_start = models.DateTimeField()
+    date_time_start = models.DateTimeField(db_index=True)
     date_time_end = models.DateTimeField()
 
     def __str__(self):
@@ -75,28 +76,59 @@ class Tag(models.Model):
     category = models.CharField(max_length=100, blank=True, null=True)
     subcategory = models.CharField(max_length=100, blank=True, null=True)
     for_what = models.CharField(max_length=100, blank=True, null=True)
+    # число задач с тегом; ведут сигналы Task, пересчитывает tags.recount()
+    task_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        constraints = [
+            # теги общие для задач (tags.intern); NULL приводим к '', иначе NULL != NULL
+            models.UniqueConstraint(
+                Coalesce('category', models.Value('')),
+                Coalesce('subcategory', models.Value('')),
+                Coalesce('for_what', models.Value('')),
+                name='tag_unique_triple',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.category} - {self.subcategory} - {self.for_what}'
 
     def to_tag(self):
-        parts = []
+        from .tags import format_tag
+        return format_tag(self.category, self.subcategory, self.for_what)
 
-        for field in [self.category, self.subcategory]:
-            parts.append(field if field else '_')
+    def to_description(self, tag):
+        from .tags import parse_tag
+        self.category, self.subcategory, self.for_what = parse_tag(tag)
 
-        parts.append(self.for_what if self.for_what else '_')
 
-        return '#' + '-'.join(parts)
+def search_text(title, tag=None, head_title=None):
+    # название, тег и название родительской задачи одной строкой - для полнотекстового поиска
+    parts = [title]
 
-    def to_description(self, tag):
-        parts = tag[1:].split('-')
+    if tag:
+        parts += [tag.category, tag.subcategory, tag.for_what]
+
+    if head_title:
+        parts.append(head_title)
+
+    return ' '.join(part for part in parts if part)
 
-        new_parts = [p if p != '_' else None for p in parts]
 
-        self.category = new_parts[0]
-        self.subcategory = new_parts[1]
-        self.for_what = new_parts[2]
+def task_indexes():
+    # istartswith на PostgreSQL - UPPER(title) LIKE UPPER('abc%'); индекс работает только с text_pattern_ops.
+    # Объявлены всегда, чтобы миграции не зависели от окружения; в БД создаются только на PostgreSQL
+    # (postgres.PostgresOnly)
+    from django.contrib.postgres.indexes import OpClass
+    from django.contrib.postgres.search import SearchVector
+    from django.db.models.functions import Upper
+    from .postgres import PostgresGinIndex, PostgresIndex
+
+    return [
+        PostgresIndex(OpClass(Upper('title'), name='text_pattern_ops'), name='task_title_prefix'),
+        # то же выражение, что строит search.PostgresSearch, иначе индекс не используется
+        PostgresGinIndex(SearchVector('search_document', config='simple'), name='task_search_document'),
+    ]
 
 
 class Task(models.Model):
@@ -117,8 +149,8 @@ class Task(models.Model):
                                    on_delete=models.CASCADE,
                                    related_name='created_tasks',
                                    null=True, blank=True)
-    priority = models.BooleanField(default=True)
-    deadline = models.DateTimeField(default=default_deadline)
+    priority = models.BooleanField(default=True, db_index=True)
+    deadline = models.DateTimeField(default=default_deadline, db_index=True)
     status = models.ForeignKey(Status,
                                on_delete=models.CASCADE,
                                related_name='tasks',
@@ -131,21 +163,85 @@ class Task(models.Model):
                             related_name='tag_tasks',
                             null=True, blank=True)
 
+    # см. search_text() выше
+    search_document = models.TextField(blank=True, editable=False)
+
+    class Meta:
+        indexes = task_indexes()
+
+    def save(self, *args, **kwargs):
+        self.search_document = self.build_search_document()
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'search_document'}
+
+        super().save(*args, **kwargs)
+
+    def build_search_document(self):
+        return search_text(self.title,
+                           self.tag if self.tag_id else None,
+                           self.head_task.title if self.head_task_id else None)
+
     def __str__(self):
         return f'{self.title} - {self.status} - {self.deadline}'
 
 
+class TaskRollup(models.Model):
+    # сводка по всем потомкам задачи; обновляет tree.refresh_rollups при изменении поддерева
+    task = models.OneToOneField(Task,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='rollup')
+    descendants = models.PositiveIntegerField(default=0)
+    status_counts = models.JSONField(default=dict)
+    earliest_deadline = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f'Rollup for task {self.task_id}'
+
+
 class Notification(models.Model):
+    PENDING = 'pending'
+    SENDING = 'sending'
+    DELIVERED = 'delivered'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENDING, 'Sending'),
+        (DELIVERED, 'Delivered'),
+        (FAILED, 'Failed'),
+    ]
+
     user = models.ForeignKey(CustomUser,
                              on_delete=models.CASCADE,
                              related_name='notifications')
-    type = models.CharField(max_length=150)
-    send_time = models.DateTimeField(default=timezone.now)
+    type = models.CharField(max_length=150, db_index=True)
+    send_time = models.DateTimeField(default=timezone.now, db_index=True)
     message = models.TextField()
     task = models.ForeignKey(Task,
                              on_delete=models.CASCADE,
                              related_name='notifications')
 
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    # когда запись снова можно забрать: время отправки, повтора или конец аренды воркера
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    delivered_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def save(self, *args, **kwargs):
+        # не отправляем раньше send_time
+        if self._state.adding and self.next_attempt_at < self.send_time:
+            self.next_attempt_at = self.send_time
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f'Notification for {self.user} - {self.type}'
 
@@ -163,6 +259,25 @@ class UserSchedule(models.Model):
         return f'Schedule for {self.user.django_user.first_name} {self.user.django_user.last_name}'
 
 
+def vacation_constraints():
+    # пересечение отпусков запрещает сама БД; в SQLite (тесты) ограничение не создаётся
+    # (postgres.PostgresOnly) и остаётся проверка в форме
+    from django.contrib.postgres.fields import RangeOperators
+    from .postgres import DateRange, Int8Range, PostgresExclusionConstraint
+
+    # пользователь тоже как диапазон: GiST умеет && для диапазонов без расширения btree_gist
+    return [
+        PostgresExclusionConstraint(
+            name='vacation_no_overlap',
+            index_type='GIST',
+            expressions=[
+                (Int8Range('user_schedule', 'user_schedule', models.Value('[]')), RangeOperators.OVERLAPS),
+                (DateRange('date_start', 'date_end', models.Value('[]')), RangeOperators.OVERLAPS),
+            ],
+        ),
+    ]
+
+
 class Vacation(models.Model):
     user_schedule = models.ForeignKey(UserSchedule,
                                       on_delete=models.CASCADE,
@@ -170,3 +285,66 @@ class Vacation(models.Model):
     date_start = models.DateField()
     date_end = models.DateField()
     tag = models.CharField(max_length=100)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user_schedule', 'date_start', 'date_end']),
+        ]
+        constraints = vacation_constraints()
+
+    @classmethod
+    def overlapping(cls, user_schedule, date_start, date_end):
+        # индексный диапазонный запрос вместо перебора всех отпусков
+        return cls.objects.filter(user_schedule=user_schedule,
+                                  date_start__lte=date_end,
+                                  date_end__gte=date_start)
+
+
+class TaskChange(models.Model):
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+
+    ACTION_CHOICES = [
+        (CREATED, 'Created'),
+        (UPDATED, 'Updated'),
+        (DELETED, 'Deleted'),
+    ]
+
+    # без FK: запись должна пережить удаление задачи
+    task_id = models.BigIntegerField()
+    managed_by_id = models.BigIntegerField(null=True, blank=True)
+    previous_managed_by_id = models.BigIntegerField(null=True, blank=True)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['managed_by_id', 'id']),
+            models.Index(fields=['previous_managed_by_id', 'id']),
+        ]
+
+    def __str__(self):
+        return f'{self.action} task {self.task_id}'
+
+
+class ProfileReport(models.Model):
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             on_delete=models.SET_NULL,
+                             related_name='profile_reports',
+                             null=True, blank=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2000)
+    view_name = models.CharField(max_length=255, blank=True, db_index=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField()
+    report = models.TextField()
+    sql = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.method} {self.path} - {self.duration_ms:.0f} ms'
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import math
+import os
+import time
+import urllib.request
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Notification
+
+
+MAX_ATTEMPTS = getattr(settings, 'NOTIFICATION_MAX_ATTEMPTS', 5)
+RETRY_BASE_SECONDS = getattr(settings, 'NOTIFICATION_RETRY_BASE_SECONDS', 30)
+# сколько воркер держит забранные записи; потом их может забрать другой
+LEASE_SECONDS = getattr(settings, 'NOTIFICATION_LEASE_SECONDS', 300)
+# минимальный интервал между сообщениями одному получателю
+RECIPIENT_INTERVAL = getattr(settings, 'NOTIFICATION_RECIPIENT_INTERVAL', 1.0)
+# предельное время одной отправки: таймаут самого HTTP-запроса
+SEND_TIMEOUT = getattr(settings, 'NOTIFICATION_SEND_TIMEOUT', 15)
+
+
+class DeliveryError(Exception):
+    pass
+
+
+class FakeTransport:
+    # для локального запуска и тестов: сообщения копятся в памяти
+    def __init__(self):
+        self.sent = []
+        self.fail_for = set()
+
+    async def send(self, recipient, text):
+        if recipient in self.fail_for:
+            raise DeliveryError(f'{recipient} is unavailable')
+        self.sent.append((recipient, text))
+
+
+class TelegramTransport:
+    # таймаут у самого запроса: asyncio.wait_for отменил бы лишь ожидание, а запрос в потоке
+    # доходил бы до Telegram уже после того, как уведомление ушло на повтор
+    def __init__(self, token=None, timeout=SEND_TIMEOUT):
+        self.token = token or os.getenv('TELEGRAM_BOT_TOKEN')
+        self.timeout = timeout
+
+    def _send(self, recipient, text):
+        request = urllib.request.Request(
+            f'https://api.telegram.org/bot{self.token}/sendMessage',
+            data=json.dumps({'chat_id': recipient, 'text': text}).encode(),
+            headers={'Content-Type': 'application/json'},
+        )
+
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                data = json.load(response)
+        except OSError as e:
+            raise DeliveryError(str(e))
+
+        if not data.get('ok'):
+            raise DeliveryError(data.get('description', 'Telegram error'))
+
+    async def send(self, recipient, text):
+        await asyncio.to_thread(self._send, recipient, text)
+
+
+def get_transport():
+    # без явной настройки воркер не запускается, иначе уведомления молча "доставлялись" бы в никуда
+    backend = getattr(settings, 'NOTIFICATION_TRANSPORT', None)
+    if not backend:
+        raise ImproperlyConfigured('NOTIFICATION_TRANSPORT is not set, '
+                                   'e.g. manager.notifications.TelegramTransport')
+    return import_string(backend)()
+
+
+def lease_seconds(batch_size):
+    # аренда дольше худшего случая: все сообщения пачки одному получателю и каждое упирается в таймаут
+    return max(LEASE_SECONDS, batch_size * (SEND_TIMEOUT + RECIPIENT_INTERVAL))
+
+
+def claim_batch(batch_size):
+    now = timezone.now()
+    # next_attempt_at забранных строк - метка аренды: результаты записывает только её владелец
+    lease = now + timedelta(seconds=lease_seconds(batch_size))
+
+    # SKIP LOCKED: параллельные воркеры не ждут друг друга и не берут одни и те же строки
+    with transaction.atomic():
+        ids = list(
+            Notification.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(Q(status=Notification.PENDING) | Q(status=Notification.SENDING),
+                    next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+
+        Notification.objects.filter(id__in=ids).update(
+            status=Notification.SENDING,
+            next_attempt_at=lease,
+        )
+
+    return list(Notification.objects.filter(id__in=ids).select_related('user'))
+
+
+class RecipientLimiter:
+    # время последней отправки получателю хранится в общем кэше: промежуток держится
+    # между пачками и между воркерами, а не только внутри одного deliver()
+    def __init__(self, interval):
+        self.interval = interval
+        self.locks = {}
+
+    @staticmethod
+    def key(recipient):
+        return f'notify:last_sent:{recipient}'
+
+    async def wait(self, recipient):
+        lock = self.locks.setdefault(recipient, asyncio.Lock())
+
+        await lock.acquire()
+        delay = await cache.aget(self.key(recipient), 0) + self.interval - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return lock
+
+    async def done(self, recipient, lock):
+        try:
+            await cache.aset(self.key(recipient), time.time(), math.ceil(self.interval) + 1)
+        finally:
+            lock.release()
+
+
+async def deliver(notifications, transport, concurrency=10, recipient_interval=RECIPIENT_INTERVAL):
+    # возвращает {id: None | текст ошибки}
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RecipientLimiter(recipient_interval)
+    results = {}
+
+    async def send_one(notification):
+        recipient = notification.user.telegram_username
+
+        lock = await limiter.wait(recipient)
+        try:
+            async with semaphore:
+                await transport.send(recipient, notification.message)
+            results[notification.id] = None
+        except Exception as e:
+            results[notification.id] = str(e) or e.__class__.__name__
+        finally:
+            await limiter.done(recipient, lock)
+
+    await asyncio.gather(*(send_one(notification) for notification in notifications))
+    return results
+
+
+def leased(notification):
+    # строка всё ещё наша: если аренда истекла и её забрал другой воркер, next_attempt_at уже другой
+    return Notification.objects.filter(id=notification.id, status=Notification.SENDING,
+                                       next_attempt_at=notification.next_attempt_at)
+
+
+def save_results(notifications, results):
+    now = timezone.now()
+    delivered = [n for n in notifications if results.get(n.id) is None]
+
+    # одна аренда на пачку - один UPDATE на все доставленные
+    delivered_count = Notification.objects.filter(
+        id__in=[n.id for n in delivered],
+        status=Notification.SENDING,
+        next_attempt_at__in={n.next_attempt_at for n in delivered},
+    ).update(
+        status=Notification.DELIVERED,
+        delivered_at=now,
+        last_error='',
+    )
+    failed_count = 0
+
+    for notification in notifications:
+        error = results.get(notification.id)
+        if error is None:
+            continue
+
+        attempts = notification.attempts + 1
+        if attempts >= MAX_ATTEMPTS:
+            status, next_attempt_at = Notification.FAILED, now
+        else:
+            status = Notification.PENDING
+            next_attempt_at = now + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+        failed_count += leased(notification).update(
+            status=status,
+            attempts=attempts,
+            next_attempt_at=next_attempt_at,
+            last_error=error,
+        )
+
+    return delivered_count, failed_count
+
+
+def run_once(transport, batch_size=100, concurrency=10):
+    notifications = claim_batch(batch_size)
+    if not notifications:
+        return 0, 0
+
+    results = asyncio.run(deliver(notifications, transport, concurrency))
+    return save_results(notifications, results)
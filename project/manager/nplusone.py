@@ -0,0 +1,104 @@
+import logging
+import re
+import sys
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger('manager.nplusone')
+
+# сколько одинаковых запросов с одной строки кода считаем N+1
+NPLUSONE_THRESHOLD = getattr(settings, 'NPLUSONE_THRESHOLD', 3)
+
+PROJECT_DIR = str(settings.BASE_DIR)
+# обёртки запросов (метрики, профайлер) - не место вызова
+INSTRUMENTATION_MODULES = {'manager.metrics', 'manager.profiling', 'manager.nplusone'}
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+class NPlusOneError(AssertionError):
+    pass
+
+
+def normalize(sql):
+    # IN (%s, %s, ...) разной длины - один и тот же запрос
+    return IN_LIST.sub('IN (...)', sql)
+
+
+def call_site():
+    # первая строка нашего кода в стеке (не django, не site-packages, не обёртки запросов)
+    frame = sys._getframe(2)
+    while frame:
+        if (is_project_file(frame.f_code.co_filename)
+                and frame.f_globals.get('__name__') not in INSTRUMENTATION_MODULES):
+            return frame
+        frame = frame.f_back
+    return None
+
+
+def is_project_file(filename):
+    return filename.startswith(PROJECT_DIR) and 'site-packages' not in filename
+
+
+class QueryRecorder:
+    def __init__(self, threshold=NPLUSONE_THRESHOLD):
+        self.threshold = threshold
+        self.counts = Counter()
+        self.stacks = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        frame = call_site()
+        if frame is not None:
+            key = (frame.f_code.co_filename, frame.f_lineno, normalize(sql))
+            self.counts[key] += 1
+            if key not in self.stacks:
+                self.stacks[key] = traceback.extract_stack(frame)
+
+        return execute(sql, params, many, context)
+
+    def problems(self):
+        return [(key, count) for key, count in self.counts.items() if count >= self.threshold]
+
+    def report(self):
+        lines = []
+        for (filename, lineno, sql), count in self.problems():
+            lines.append(f'{count} similar queries from {filename}:{lineno}\n    {sql}')
+            stack = [entry for entry in self.stacks[(filename, lineno, sql)]
+                     if is_project_file(entry.filename)]
+            lines.append(''.join(traceback.format_list(stack)))
+        return '\n'.join(lines)
+
+
+@contextmanager
+def detect_n_plus_one(threshold=NPLUSONE_THRESHOLD, mode='raise', using='default'):
+    recorder = QueryRecorder(threshold)
+
+    with connections[using].execute_wrapper(recorder):
+        yield recorder
+
+    if recorder.problems():
+        message = 'Possible N+1 queries:\n' + recorder.report()
+        if mode == 'raise':
+            raise NPlusOneError(message)
+        logger.warning(message)
+
+
+class NPlusOneMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # 'off', 'log' или 'raise'; тест-раннер включает 'raise'
+        mode = getattr(settings, 'NPLUSONE_MODE', 'off')
+        if mode not in ('log', 'raise'):
+            return self.get_response(request)
+
+        # шаблоны TemplateResponse рендерятся внутри get_response, их запросы тоже попадают
+        with detect_n_plus_one(mode=mode):
+            response = self.get_response(request)
+
+        return response
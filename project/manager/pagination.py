@@ -0,0 +1,82 @@
+import base64
+import json
+from datetime import date, datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def encode_cursor(values):
+    # значения ключа сортировки последней строки страницы
+    values = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+    # только список скаляров: вложенные объекты из подделанного курсора ломают фильтр (TypeError -> 500)
+    if not isinstance(values, list) or not all(isinstance(value, (str, int, float)) for value in values):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def _value(obj, path):
+    for name in path.split('__'):
+        obj = getattr(obj, name)
+    return obj
+
+
+def _field(queryset, path):
+    # поле модели по пути 'a__b' или аннотация запроса (rank)
+    if path in queryset.query.annotations:
+        return queryset.query.annotations[path].output_field
+
+    model, field = queryset.model, None
+    for name in path.split('__'):
+        field = model._meta.get_field(name)
+        model = field.related_model
+    return field
+
+
+def to_python(queryset, ordering, values):
+    # значения курсора приводятся к типам полей сортировки: [5, 1] для deadline - не дата, а 400
+    try:
+        return [_field(queryset, field.lstrip('-')).to_python(value) for field, value in zip(ordering, values)]
+    except (TypeError, ValidationError):
+        raise ValueError('Invalid cursor')
+
+
+def after(ordering, values):
+    # (a, b, id) > (x, y, z) как OR из префиксов: a > x | a = x & b > y | ...
+    condition = Q()
+    equal = {}
+
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+
+    return condition
+
+
+def keyset_page(queryset, ordering, cursor=None, limit=20):
+    # ordering должен заканчиваться уникальным полем (id), иначе строки на границе страниц теряются
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(ordering):
+            raise ValueError('Invalid cursor')
+        queryset = queryset.filter(after(ordering, to_python(queryset, ordering, values)))
+
+    items = list(queryset.order_by(*ordering)[:limit + 1])
+    next_cursor = None
+
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor([_value(items[-1], field.lstrip('-')) for field in ordering])
+
+    return items, next_cursor
@@ -0,0 +1,53 @@
+# Нужен psycopg (он и так нужен для PostgreSQL из settings)
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import BigIntegerRangeField, DateRangeField
+from django.contrib.postgres.indexes import GinIndex
+from django.db import DEFAULT_DB_ALIAS, connections, models
+
+
+class DateRange(models.Func):
+    function = 'DATERANGE'
+    output_field = DateRangeField()
+
+
+class Int8Range(models.Func):
+    function = 'INT8RANGE'
+    output_field = BigIntegerRangeField()
+
+
+class PostgresOnly:
+    # Индекс или ограничение только для PostgreSQL: в других БД вместо DDL - комментарий.
+    # Объявлены в Meta одинаково для всех окружений; SQLite видит их и когда пересоздаёт таблицу
+    # при изменении поля, поэтому пропускать их на уровне операции миграции недостаточно
+    def skipped(self, schema_editor):
+        return schema_editor.connection.vendor != 'postgresql'
+
+    def create_sql(self, model, schema_editor, *args, **kwargs):
+        if self.skipped(schema_editor):
+            return f'-- {self.name}: PostgreSQL only'
+        return super().create_sql(model, schema_editor, *args, **kwargs)
+
+    def remove_sql(self, model, schema_editor, *args, **kwargs):
+        if self.skipped(schema_editor):
+            return f'-- {self.name}: PostgreSQL only'
+        return super().remove_sql(model, schema_editor, *args, **kwargs)
+
+
+class PostgresIndex(PostgresOnly, models.Index):
+    pass
+
+
+class PostgresGinIndex(PostgresOnly, GinIndex):
+    pass
+
+
+class PostgresExclusionConstraint(PostgresOnly, ExclusionConstraint):
+    def constraint_sql(self, model, schema_editor):
+        if self.skipped(schema_editor):
+            return None
+        return super().constraint_sql(model, schema_editor)
+
+    def validate(self, model, instance, exclude=None, using=DEFAULT_DB_ALIAS):
+        # без ограничения в БД остаётся проверка в форме
+        if connections[using].vendor == 'postgresql':
+            super().validate(model, instance, exclude, using)
@@ -0,0 +1,104 @@
+import cProfile
+import io
+import pstats
+import random
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import view_name
+from .models import ProfileReport
+
+
+PROFILER_HEADER = 'X-Profile'
+PROFILER_PARAM = '_profile'
+# доля запросов, которые профилируются без явного запроса (0 - выключено)
+PROFILER_SAMPLE_RATE = getattr(settings, 'PROFILER_SAMPLE_RATE', 0)
+# сколько отчётов храним; старые удаляются
+PROFILER_MAX_REPORTS = getattr(settings, 'PROFILER_MAX_REPORTS', 200)
+PROFILER_MAX_REPORT_SIZE = 200 * 1024
+PROFILER_MAX_QUERIES = 500
+PROFILER_TOP_FUNCTIONS = 60
+
+
+class QueryLog:
+    def __init__(self):
+        self.queries = []
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            if len(self.queries) < PROFILER_MAX_QUERIES:
+                self.queries.append((time.perf_counter() - started, sql))
+
+
+def should_profile(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_staff:
+        if request.headers.get(PROFILER_HEADER) or request.GET.get(PROFILER_PARAM):
+            return True
+
+    return PROFILER_SAMPLE_RATE > 0 and random.random() < PROFILER_SAMPLE_RATE
+
+
+def format_stats(profiler):
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats('cumulative').print_stats(PROFILER_TOP_FUNCTIONS)
+    stats.print_callees(PROFILER_TOP_FUNCTIONS // 3)
+    return stream.getvalue()[:PROFILER_MAX_REPORT_SIZE]
+
+
+def save_report(request, response, duration, profiler, query_log):
+    user = getattr(request, 'user', None)
+
+    ProfileReport.objects.create(
+        user=user if user is not None and user.is_authenticated else None,
+        method=request.method,
+        path=request.get_full_path()[:2000],
+        view_name=view_name(request),
+        status_code=response.status_code,
+        duration_ms=duration * 1000,
+        query_count=query_log.count,
+        report=format_stats(profiler),
+        sql='\n'.join(f'{seconds * 1000:.2f} ms  {sql}' for seconds, sql in query_log.queries)[:PROFILER_MAX_REPORT_SIZE],
+    )
+
+    # храним только последние отчёты
+    stale = ProfileReport.objects.order_by('-created_at', '-id').values_list('id', flat=True)[PROFILER_MAX_REPORTS:]
+    ProfileReport.objects.filter(id__in=list(stale)).delete()
+
+
+class ProfilerMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not should_profile(request):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        query_log = QueryLog()
+
+        try:
+            profiler.enable()
+        except ValueError:
+            # в этом потоке уже работает другой профайлер
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        try:
+            with connections['default'].execute_wrapper(query_log):
+                response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duration = time.perf_counter() - started
+
+        save_report(request, response, duration, profiler, query_log)
+        response['X-Profile-Report'] = 'saved'
+        return response
@@ -0,0 +1,154 @@
+import heapq
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max
+
+from .changes import OVERLAP
+from .models import Notification, Task, TaskChange
+
+
+REMINDER_OFFSETS = [timedelta(**offset) for offset in
+                    getattr(settings, 'REMINDER_OFFSETS', [{'hours': 24}, {'hours': 1}])]
+# задачи в этих статусах не напоминаем
+REMINDER_SKIP_STATUSES = getattr(settings, 'REMINDER_SKIP_STATUSES', ['done'])
+# насколько вперёд (сверх самого раннего напоминания) держим задачи в памяти
+REMINDER_WINDOW = timedelta(hours=1)
+# опоздавшие напоминания в пределах этого времени ещё отправляем
+REMINDER_GRACE = timedelta(minutes=5)
+
+
+def reminder_type(offset):
+    return f'deadline_{int(offset.total_seconds())}'
+
+
+def reminder_message(task, offset):
+    hours = offset.total_seconds() / 3600
+    left = f'{hours:g} h' if hours >= 1 else f'{int(offset.total_seconds() // 60)} min'
+    return f'Task "{task["title"]}" is due in {left} ({task["deadline"]:%Y-%m-%d %H:%M})'
+
+
+# Мин-куча (время напоминания, id задачи, смещение) по задачам ближайшего окна.
+# Правки дедлайнов приходят из журнала TaskChange, устаревшие записи кучи
+# отбрасываются при извлечении.
+class DeadlineScheduler:
+    def __init__(self, offsets=REMINDER_OFFSETS, window=REMINDER_WINDOW):
+        self.offsets = sorted(offsets)
+        self.horizon = max(self.offsets) + window
+        self.heap = []
+        self.tasks = {}
+        self.loaded_until = None
+        self.last_change_id = None
+        # id в окне перечитывания, которые уже применены
+        self.seen_change_ids = set()
+
+    def _tasks_queryset(self):
+        return (Task.objects.filter(managed_by__isnull=False)
+                .exclude(status__name__in=REMINDER_SKIP_STATUSES)
+                .values('id', 'title', 'deadline', 'managed_by_id'))
+
+    def _schedule(self, task, now):
+        # последним срабатывает самое короткое смещение; если оно уже прошло - прошли все
+        if task['deadline'] - self.offsets[0] < now - REMINDER_GRACE:
+            return
+
+        self.tasks[task['id']] = task
+
+        for offset in self.offsets:
+            remind_at = task['deadline'] - offset
+            if remind_at >= now - REMINDER_GRACE:
+                heapq.heappush(self.heap, (remind_at, task['id'], offset, task['deadline']))
+
+    def start(self, now):
+        self.last_change_id = TaskChange.objects.aggregate(last=Max('id'))['last'] or 0
+        # задачи загружаются целиком ниже - уже видимые записи окна применять не нужно
+        self.seen_change_ids = set(TaskChange.objects.filter(id__gt=max(self.last_change_id - OVERLAP, 0))
+                                   .values_list('id', flat=True))
+        self.loaded_until = now
+        self.load_window(now)
+
+    def load_window(self, now):
+        # читаем только следующий кусок по индексу на deadline
+        until = now + self.horizon
+        if until <= self.loaded_until:
+            return
+
+        for task in self._tasks_queryset().filter(deadline__gt=self.loaded_until,
+                                                  deadline__lte=until):
+            self._schedule(task, now)
+
+        self.loaded_until = until
+
+    def apply_changes(self, now):
+        # как в changes.load_changes: запись с меньшим id может закоммититься позже прочитанных
+        changes = list(
+            TaskChange.objects.filter(id__gt=max(self.last_change_id - OVERLAP, 0))
+            .order_by('id').values_list('id', 'task_id')
+        )
+        task_ids = {task_id for change_id, task_id in changes if change_id not in self.seen_change_ids}
+        self.seen_change_ids = {change_id for change_id, task_id in changes}
+        if changes:
+            self.last_change_id = max(self.last_change_id, changes[-1][0])
+        if not task_ids:
+            return
+
+        for task_id in task_ids:
+            self.tasks.pop(task_id, None)
+
+        # удалённые или ушедшие за окно задачи просто не вернутся в self.tasks
+        for task in self._tasks_queryset().filter(id__in=task_ids,
+                                                  deadline__gt=now,
+                                                  deadline__lte=self.loaded_until):
+            self._schedule(task, now)
+
+    def due(self, now):
+        due = []
+
+        while self.heap and self.heap[0][0] <= now:
+            remind_at, task_id, offset, deadline = heapq.heappop(self.heap)
+
+            task = self.tasks.get(task_id)
+            if task is None or task['deadline'] != deadline:
+                continue
+
+            due.append((remind_at, task, offset))
+
+        return due
+
+    def tick(self, now):
+        if self.loaded_until is None:
+            self.start(now)
+
+        self.apply_changes(now)
+        self.load_window(now)
+
+        due = self.due(now)
+        if not due:
+            return []
+
+        # повторный запуск не должен дублировать уже созданные напоминания
+        existing = set(Notification.objects.filter(
+            task_id__in={task['id'] for remind_at, task, offset in due},
+            type__in={reminder_type(offset) for remind_at, task, offset in due},
+        ).values_list('task_id', 'type', 'send_time'))
+
+        reminders = []
+        for remind_at, task, offset in due:
+            key = (task['id'], reminder_type(offset), remind_at)
+            if key in existing:
+                continue
+            existing.add(key)
+
+            reminders.append(Notification(user_id=task['managed_by_id'],
+                                          task_id=task['id'],
+                                          type=reminder_type(offset),
+                                          send_time=remind_at,
+                                          next_attempt_at=remind_at,
+                                          message=reminder_message(task, offset)))
+
+        # после последнего напоминания задача больше не нужна в памяти
+        for remind_at, task, offset in due:
+            if offset == self.offsets[0]:
+                self.tasks.pop(task['id'], None)
+
+        return Notification.objects.bulk_create(reminders)
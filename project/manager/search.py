@@ -0,0 +1,112 @@
+from django.db import connection
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+
+from .models import Task
+
+
+FTS_TABLE = 'manager_task_fts'
+REINDEX_BATCH_SIZE = 1000
+
+
+class PostgresSearch:
+    # GIN-индекс по to_tsvector('simple', search_document) объявлен в Task.Meta
+    def install(self):
+        pass
+
+    def index(self, tasks):
+        pass
+
+    def remove(self, task_ids):
+        pass
+
+    def search(self, queryset, text):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        vector = SearchVector('search_document', config='simple')
+        query = SearchQuery(text, config='simple', search_type='websearch')
+
+        # ts_rank возвращает real: его значение не переживает JSON-курсор keyset_page, и строки
+        # с равным rank на границе страниц терялись бы; double precision - переживает
+        return (queryset
+                .alias(document=vector)
+                .filter(document=query)
+                .annotate(rank=Cast(SearchRank(vector, query), FloatField())))
+
+
+class SQLiteSearch:
+    # FTS5 для тестов и локальной разработки: rowid таблицы = id задачи
+    def install(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(document)')
+
+    def index(self, tasks):
+        rows = [(task.pk, task.search_document) for task in tasks]
+        if not rows:
+            return
+
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk, document in rows])
+            cursor.executemany(f'INSERT INTO {FTS_TABLE} (rowid, document) VALUES (%s, %s)', rows)
+
+    def remove(self, task_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in task_ids])
+
+    def search(self, queryset, text):
+        match = fts_query(text)
+        table = Task._meta.db_table
+
+        # bm25 - чем меньше, тем лучше; разворачиваем, чтобы сортировка совпадала с PostgreSQL
+        rank = RawSQL(f'SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+                      f'WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id', [match],
+                      output_field=FloatField())
+
+        return (queryset
+                .filter(id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]))
+                .annotate(rank=rank))
+
+
+def fts_query(text):
+    # каждое слово в кавычках: операторы FTS5 из пользовательского ввода не работают
+    return ' '.join('"{}"'.format(word.replace('"', '""')) for word in text.split())
+
+
+BACKENDS = {
+    'postgresql': PostgresSearch,
+    'sqlite': SQLiteSearch,
+}
+
+
+def get_backend():
+    return BACKENDS[connection.vendor]()
+
+
+def search_tasks(queryset, text):
+    return get_backend().search(queryset, text)
+
+
+def reindex(queryset, batch_size=REINDEX_BATCH_SIZE):
+    # пересчитать search_document (тег или родитель изменились, bulk_create, старые данные)
+    backend = get_backend()
+    batch = []
+    count = 0
+
+    def flush():
+        Task.objects.bulk_update(batch, ['search_document'])
+        backend.index(batch)
+        batch.clear()
+
+    for task in queryset.select_related('tag', 'head_task').order_by('pk').iterator(chunk_size=batch_size):
+        task.search_document = task.build_search_document()
+        batch.append(task)
+        count += 1
+
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+
+    return count
@@ -0,0 +1,9 @@
+from rest_framework import serializers
+
+from .models import Holiday
+
+
+class HolidaySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Holiday
+        fields = ('id', 'name', 'date_time_start', 'date_time_end', 'department')
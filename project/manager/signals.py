@@ -0,0 +1,153 @@
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import cache, changes, search, tags, tree
+from .models import CustomUser, Holiday, Tag, Task, TaskChange, UserSchedule, Vacation
+
+
+# прежние значения полей, от которых зависят кэш, поиск, счётчики тегов и сводки дерева
+TRACKED_TASK_FIELDS = ('managed_by_id', 'title', 'tag_id', 'head_task_id', 'status_id', 'deadline')
+
+
+@receiver(pre_save, sender=Task)
+def remember_task_state(sender, instance, **kwargs):
+    instance._old = {}
+
+    if instance.pk:
+        instance._old = (
+            Task.objects.filter(pk=instance.pk)
+            .values(*TRACKED_TASK_FIELDS)
+            .first()
+        ) or {}
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def task_changed(sender, instance, **kwargs):
+    # инвалидируем и старого, и нового исполнителя
+    old_managed_by_id = getattr(instance, '_old', {}).get('managed_by_id')
+
+    if kwargs['signal'] is post_delete:
+        action = TaskChange.DELETED
+    elif kwargs.get('created'):
+        action = TaskChange.CREATED
+    else:
+        action = TaskChange.UPDATED
+
+    changes.tasks_changed([(instance.pk, instance.managed_by_id, old_managed_by_id, action)])
+
+
+# поисковый индекс: сама задача, а при смене названия - её подзадачи
+@receiver(post_save, sender=Task)
+def task_search_changed(sender, instance, created, **kwargs):
+    search.get_backend().index([instance])
+
+    if not created and instance._old.get('title') != instance.title:
+        search.reindex(Task.objects.filter(head_task=instance))
+
+
+@receiver(post_delete, sender=Task)
+def task_search_deleted(sender, instance, **kwargs):
+    search.get_backend().remove([instance.pk])
+
+
+@receiver(post_save, sender=Tag)
+def tag_search_changed(sender, instance, created, **kwargs):
+    if not created:
+        tags.forget(instance.pk)
+        search.reindex(Task.objects.filter(tag=instance))
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    tags.forget(instance.pk)
+
+
+# счётчики задач по тегам для фасетов
+@receiver(post_save, sender=Task)
+def task_tag_counted(sender, instance, created, **kwargs):
+    old_tag_id = instance._old.get('tag_id')
+    if old_tag_id != instance.tag_id:
+        tags.change_count([old_tag_id], -1)
+        tags.change_count([instance.tag_id], 1)
+
+
+@receiver(post_delete, sender=Task)
+def task_tag_uncounted(sender, instance, **kwargs):
+    tags.change_count([instance.tag_id], -1)
+
+
+# сводки по поддеревьям: пересчитываем предков старого и нового родителя
+@receiver(post_save, sender=Task)
+def task_rollups_changed(sender, instance, created, **kwargs):
+    old = instance._old
+    if created or any(old.get(field) != getattr(instance, field)
+                      for field in ('head_task_id', 'status_id', 'deadline')):
+        tree.refresh_rollups([instance.head_task_id, old.get('head_task_id')])
+
+
+@receiver(post_delete, sender=Task)
+def task_rollups_deleted(sender, instance, **kwargs):
+    tree.refresh_rollups([instance.head_task_id])
+
+
+@receiver(post_migrate)
+def install_search(sender, using, **kwargs):
+    if sender.name == 'manager':
+        search.get_backend().install()
+
+
+@receiver(post_save, sender=UserSchedule)
+@receiver(post_delete, sender=UserSchedule)
+def schedule_changed(sender, instance, **kwargs):
+    cache.bump_versions([instance.user_id])
+
+
+@receiver(post_save, sender=Vacation)
+@receiver(post_delete, sender=Vacation)
+def vacation_changed(sender, instance, **kwargs):
+    user_id = (
+        UserSchedule.objects.filter(pk=instance.user_schedule_id)
+        .values_list('user_id', flat=True)
+        .first()
+    )
+    cache.bump_versions([user_id])
+
+
+@receiver(post_save, sender=CustomUser)
+def profile_changed(sender, instance, **kwargs):
+    cache.bump_versions([instance.pk])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def django_user_changed(sender, instance, **kwargs):
+    # имя пользователя входит в заголовки событий
+    cache.bump_versions(
+        CustomUser.objects.filter(django_user=instance).values_list('id', flat=True)
+    )
+
+
+# праздники кэшируются по отделу (holidays.department_events), события сотрудников не трогаем;
+# при удалении связи с отделами удаляются раньше post_delete, поэтому pre_delete
+@receiver(post_save, sender=Holiday)
+@receiver(pre_delete, sender=Holiday)
+def holiday_changed(sender, instance, **kwargs):
+    cache.bump_departments(
+        Holiday.department.through.objects.filter(holiday_id=instance.pk)
+        .values_list('department_id', flat=True)
+    )
+
+
+@receiver(m2m_changed, sender=Holiday.department.through)
+def holiday_departments_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if reverse:
+        # instance - отдел, pk_set - праздники
+        cache.bump_departments([instance.pk])
+    elif action == 'pre_clear':
+        cache.bump_departments(instance.department.values_list('id', flat=True))
+    else:
+        cache.bump_departments(pk_set)
@@ -0,0 +1,111 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Tag, Task
+
+
+TAG_CACHE_TIMEOUT = 60 * 60 * 24
+EMPTY = '_'
+
+
+def normalize(value):
+    value = (value or '').strip()
+    return value or None
+
+
+def format_tag(category, subcategory, for_what):
+    # '#cat-sub-for', пустая часть - '_'
+    return '#' + '-'.join(part or EMPTY for part in (category, subcategory, for_what))
+
+
+def parse_tag(tag):
+    parts = tag.lstrip('#').split('-')
+    if len(parts) != 3:
+        raise ValueError(f'Invalid tag: {tag}')
+
+    return tuple(None if part in ('', EMPTY) else part for part in parts)
+
+
+def triple_key(triple):
+    # ключ - хеш самой тройки: в '#cat-sub-for' части с '-' неотличимы ('a-b', 'c' и 'a', 'b-c'),
+    # а сырой ввод с пробелами и длинной строкой memcached в ключе не примет
+    return 'tag:id:' + hashlib.sha1(json.dumps(triple).encode()).hexdigest()
+
+
+def id_key(tag_id):
+    return f'tag:triple:{tag_id}'
+
+
+def intern(category=None, subcategory=None, for_what=None):
+    # одинаковая тройка - одна строка Tag; None если тег пустой
+    triple = tuple(normalize(value) for value in (category, subcategory, for_what))
+    if not any(triple):
+        return None
+
+    tag_id = cache.get(triple_key(triple))
+    if tag_id is None:
+        tag_id = Tag.objects.get_or_create(category=triple[0], subcategory=triple[1], for_what=triple[2])[0].pk
+        cache.set_many({triple_key(triple): tag_id, id_key(tag_id): triple}, TAG_CACHE_TIMEOUT)
+
+    return tag_id
+
+
+def lookup(tag):
+    # '#cat-sub-for' -> id или None, без создания
+    triple = tuple(normalize(value) for value in parse_tag(tag))
+    tag_id = cache.get(triple_key(triple))
+    if tag_id is None:
+        category, subcategory, for_what = triple
+        tag_id = (Tag.objects.filter(category=category, subcategory=subcategory, for_what=for_what)
+                  .values_list('pk', flat=True).first())
+        if tag_id is not None:
+            cache.set_many({triple_key(triple): tag_id, id_key(tag_id): triple}, TAG_CACHE_TIMEOUT)
+
+    return tag_id
+
+
+def forget(tag_id):
+    triple = cache.get(id_key(tag_id))
+    cache.delete_many([id_key(tag_id)] + ([triple_key(tuple(triple))] if triple else []))
+
+
+def change_count(tag_ids, delta):
+    tag_ids = [tag_id for tag_id in tag_ids if tag_id is not None]
+    if tag_ids:
+        # счётчик мог разойтись с реальностью: ниже нуля не уходим, иначе CHECK >= 0 ломает удаление задач
+        Tag.objects.filter(pk__in=tag_ids).update(task_count=Greatest(F('task_count') + delta, 0))
+
+
+def recount():
+    # полный пересчёт счётчиков после bulk_create / queryset.update
+    counts = (Task.objects.filter(tag=OuterRef('pk')).order_by()
+              .values('tag').annotate(count=Count('pk')).values('count'))
+    Tag.objects.update(task_count=Coalesce(Subquery(counts), Value(0)))
+
+
+def facets():
+    # категории -> подкатегории -> назначение; строк Tag мало, Task не трогаем
+    tree = {}
+    for tag in Tag.objects.filter(task_count__gt=0).order_by('category', 'subcategory', 'for_what'):
+        category = tree.setdefault(tag.category, {'value': tag.category, 'count': 0, 'subcategories': {}})
+        subcategory = category['subcategories'].setdefault(
+            tag.subcategory, {'value': tag.subcategory, 'count': 0, 'for_what': []}
+        )
+
+        category['count'] += tag.task_count
+        subcategory['count'] += tag.task_count
+        subcategory['for_what'].append({
+            'value': tag.for_what,
+            'count': tag.task_count,
+            'id': tag.pk,
+            'tag': tag.to_tag(),
+        })
+
+    return [
+        {**category, 'subcategories': list(category['subcategories'].values())}
+        for category in tree.values()
+    ]
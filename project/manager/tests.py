@@ -1,3 +1,1155 @@
-from django.test import TestCase
+import io
+import json
+from unittest import mock
+from datetime import datetime, time, date, timedelta
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import models as django_models
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory
+from django.utils import timezone
+
+from . import changes, holidays, models, notifications, search, tags, transfer, tree, views
+from .availability import UserAvailability, merge_intervals, subtract_intervals, union_intervals
+from .broker import InMemoryBroker
+from .conflicts import MAX_CONFLICT_PAIRS, check_conflicts
+from . import events as events_module
+from .events import build_events
+from .forms import AddUserVacation, CreateTaskForm
+from .metrics import Registry
+from .nplusone import NPlusOneError, detect_n_plus_one
+from .pagination import encode_cursor
+from .profiling import ProfilerMiddleware
+from .reminders import DeadlineScheduler
+
+
+def create_profile(username, department):
+    django_user = User.objects.create(username=username, first_name=username.title(), last_name='Test')
+    profile = models.CustomUser.objects.create(django_user=django_user,
+                                               department=department,
+                                               job_title='developer',
+                                               telegram_username=f'@{username}')
+
+    models.UserSchedule.objects.create(user=profile,
+                                       work_hours_start=time(9, 0),
+                                       work_hours_end=time(18, 0),
+                                       personal_hours_start=time(13, 0),
+                                       personal_hours_end=time(14, 0))
+    return profile
+
+
+class CalendarEventsTest(TestCase):
+    start = '2025-01-06T00:00:00'
+    end = '2025-01-13T00:00:00'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = models.Department.objects.create(name='IT')
+        cls.status = models.Status.objects.create(name='new')
+        cls.profiles = [create_profile(f'user{i}', cls.department) for i in range(30)]
+
+        for profile in cls.profiles:
+            models.Task.objects.create(title=f'task {profile.id}',
+                                       managed_by=profile,
+                                       status=cls.status,
+                                       deadline=timezone.make_aware(datetime(2025, 1, 7, 10, 0)))
+            models.Vacation.objects.create(user_schedule=profile.schedule,
+                                           date_start=date(2025, 1, 9),
+                                           date_end=date(2025, 1, 10),
+                                           tag='vacation')
+
+    def setUp(self):
+        cache.clear()
+
+    def build(self, profiles):
+        user_ids = [str(profile.id) for profile in profiles]
+        return build_events(user_ids, self.start, self.end,
+                            self.start.split('T')[0], self.end.split('T')[0])
+
+    def test_query_count_does_not_depend_on_users(self):
+        with self.assertNumQueries(3):
+            self.build(self.profiles[:1])
+
+        with self.assertNumQueries(3):
+            events = self.build(self.profiles)
+
+        self.assertEqual(len(events), 30)
+        for profile in self.profiles:
+            user_events = events[str(profile.id)]
+            self.assertEqual(user_events[0]['title'], f'task {profile.id} (User{self.profiles.index(profile)} Test)')
+            vacations = [e for e in user_events if e.get('backgroundColor') == '#363636']
+            self.assertEqual(vacations[0]['start'], '2025-01-09T00:00:00')
+            self.assertEqual(vacations[0]['end'], '2025-01-11T00:00:00')
+
+    def test_background_events_do_not_grow_with_range(self):
+        week = self.build(self.profiles[:1])[str(self.profiles[0].id)]
+
+        self.end = '2026-01-06T00:00:00'
+        year = self.build(self.profiles[:1])[str(self.profiles[0].id)]
+
+        self.assertEqual(len(week), len(year))
+
+    def test_get_tasks_uses_cache(self):
+        request = RequestFactory().get('/tasks/', {
+            'start': self.start,
+            'end': self.end,
+            'users[]': [str(profile.id) for profile in self.profiles],
+        })
+        request.user = self.profiles[0].django_user
+
+        first = views.get_tasks(request).content
+
+        # остаётся только запрос токена синхронизации
+        with self.assertNumQueries(1):
+            second = views.get_tasks(request).content
+
+        self.assertEqual(first, second)
+
+
+class AvailabilityTest(TestCase):
+    def test_merge_and_subtract(self):
+        merged = merge_intervals([(5, 7), (1, 3), (2, 4), (7, 8)])
+        self.assertEqual(merged, [(1, 4), (5, 8)])
+        self.assertEqual(subtract_intervals([(0, 10)], merged), [(0, 1), (4, 5), (8, 10)])
+
+    def test_free_intervals(self):
+        schedule = models.UserSchedule(work_hours_start=time(9, 0),
+                                       work_hours_end=time(18, 0),
+                                       personal_hours_start=time(13, 0),
+                                       personal_hours_end=time(14, 0))
+        vacation = models.Vacation(date_start=date(2025, 1, 7), date_end=date(2025, 1, 7))
+        availability = UserAvailability(1, schedule, [vacation])
+
+        free = availability.free_intervals(datetime(2025, 1, 6), datetime(2025, 1, 9))
+
+        self.assertEqual(free, [
+            (datetime(2025, 1, 6, 9, 0), datetime(2025, 1, 6, 13, 0)),
+            (datetime(2025, 1, 6, 14, 0), datetime(2025, 1, 6, 18, 0)),
+            (datetime(2025, 1, 8, 9, 0), datetime(2025, 1, 8, 13, 0)),
+            (datetime(2025, 1, 8, 14, 0), datetime(2025, 1, 8, 18, 0)),
+        ])
+
+
+class CommonSlotsTest(TestCase):
+    def setUp(self):
+        department = models.Department.objects.create(name='IT')
+        self.first = create_profile('first', department)
+        self.second = create_profile('second', department)
+        models.UserSchedule.objects.filter(user=self.second).update(
+            work_hours_start=time(10, 0), work_hours_end=time(19, 0),
+            personal_hours_start=time(12, 0), personal_hours_end=time(13, 0))
+        models.Task.objects.create(title='Busy', managed_by=self.second,
+                                   deadline=timezone.make_aware(datetime(2025, 1, 6, 15, 0)))
+        self.client.force_login(self.first.django_user)
+
+    def get(self, **params):
+        return self.client.get('/availability/', {'users[]': [self.first.id, self.second.id],
+                                                  'start': '2025-01-06', 'end': '2025-01-07', **params})
+
+    def test_union_of_sorted_lists(self):
+        self.assertEqual(union_intervals([[(1, 3), (6, 8)], [(2, 4)], [(4, 5), (9, 10)]]),
+                         [(1, 5), (6, 8), (9, 10)])
+
+    def test_common_slots(self):
+        data = self.get().json()
+
+        self.assertEqual(data['slots'], [
+            ['2025-01-06T10:00:00', '2025-01-06T12:00:00'],
+            ['2025-01-06T14:00:00', '2025-01-06T15:00:00'],
+            ['2025-01-06T16:00:00', '2025-01-06T18:00:00'],
+        ])
+        second = data['users'][1]
+        self.assertEqual(second['user_id'], str(self.second.id))
+        self.assertIn(['2025-01-06T15:00:00', '2025-01-06T16:00:00'], second['busy'])
+
+        self.assertEqual(self.get(duration=90, limit=1).json()['slots'],
+                         [['2025-01-06T10:00:00', '2025-01-06T12:00:00']])
+
+        # вторник: отпуск первого - общих окон нет
+        models.Vacation.objects.create(user_schedule=self.first.schedule, date_start=date(2025, 1, 7),
+                                       date_end=date(2025, 1, 7), tag='vacation')
+        self.assertEqual(self.get(start='2025-01-07', end='2025-01-08').json()['slots'], [])
+
+        self.assertEqual(self.get(end='2025-06-01').status_code, 400)
+        self.assertEqual(self.get(**{'users[]': [0]}).status_code, 400)
+        self.assertEqual(self.get(duration=10 ** 12).status_code, 400)
+
+
+class TaskChangesTest(TestCase):
+    def setUp(self):
+        department = models.Department.objects.create(name='IT')
+        self.status = models.Status.objects.create(name='new')
+        self.owner = create_profile('owner', department)
+        self.other = create_profile('other', department)
+
+    def changes(self, since, profile):
+        request = RequestFactory().get('/tasks/changes/', {'since': since})
+        request.user = profile.django_user
+        return json.loads(views.get_task_changes(request).content)
+
+    def test_changes_since_token(self):
+        token = changes.current_token()
+
+        task = models.Task.objects.create(title='first', managed_by=self.owner, status=self.status)
+        removed = models.Task.objects.create(title='second', managed_by=self.owner, status=self.status)
+        removed_id = removed.id
+        removed.delete()
+
+        data = self.changes(token, self.owner)
+        self.assertEqual([event['id'] for event in data['events']], [str(task.id)])
+        self.assertEqual(data['deleted'], [str(removed_id)])
+
+        # задача ушла другому исполнителю - у старого это надгробие
+        task.managed_by = self.other
+        task.save()
+
+        data = self.changes(data['token'], self.owner)
+        self.assertEqual(data['events'], [])
+        self.assertIn(str(task.id), data['deleted'])
+
+    def test_pruned_token_expires(self):
+        token = changes.current_token()
+        for title in ('first', 'second'):
+            models.Task.objects.create(title=title, managed_by=self.owner, status=self.status)
+        models.TaskChange.objects.update(created_at=timezone.now() - changes.RETENTION - timedelta(days=1))
+
+        self.assertEqual(changes.prune_changes(), 1)
+        self.assertEqual(models.TaskChange.objects.count(), 1)
+
+        request = RequestFactory().get('/tasks/changes/', {'since': token})
+        request.user = self.owner.django_user
+        response = views.get_task_changes(request)
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(json.loads(response.content)['token'], changes.current_token())
+        self.assertFalse(changes.token_expired(changes.current_token()))
+
+
+class BrokerTest(TestCase):
+    def test_publish_reaches_subscribers_of_user(self):
+        async def run():
+            broker = InMemoryBroker()
+            owner = broker.subscribe(['1', '2'])
+            other = broker.subscribe(['3'])
+
+            await sync_to_async(broker.publish)([2], {'task_id': 10})
+
+            self.assertEqual(await owner.get(timeout=1), {'task_id': 10})
+            self.assertTrue(other.queue.empty())
+
+            broker.unsubscribe(owner)
+            broker.unsubscribe(other)
+            self.assertEqual(dict(broker.subscriptions), {})
+
+        async_to_sync(run)()
+
+
+class TaskStreamTest(TestCase):
+    def test_not_streamed_under_wsgi(self):
+        department = models.Department.objects.create(name='IT')
+        self.client.force_login(create_profile('user', department).django_user)
+
+        response = self.client.get('/tasks/stream/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+
+
+class NotificationDeliveryTest(TestCase):
+    def setUp(self):
+        department = models.Department.objects.create(name='IT')
+        self.profile = create_profile('owner', department)
+        self.task = models.Task.objects.create(title='task', managed_by=self.profile)
+        cache.clear()
+
+    def create(self, **kwargs):
+        return models.Notification.objects.create(user=self.profile, task=self.task,
+                                                  type='reminder', message='soon', **kwargs)
+
+    def test_delivers_due_notifications_once(self):
+        due = self.create()
+        later = self.create(send_time=timezone.now() + timedelta(hours=1))
+        transport = notifications.FakeTransport()
+
+        self.assertEqual(notifications.run_once(transport), (1, 0))
+        self.assertEqual(notifications.run_once(transport), (0, 0))
+
+        self.assertEqual(transport.sent, [('@owner', 'soon')])
+        due.refresh_from_db()
+        later.refresh_from_db()
+        self.assertEqual(due.status, models.Notification.DELIVERED)
+        self.assertEqual(later.status, models.Notification.PENDING)
+
+    def test_expired_lease_is_not_overwritten(self):
+        notification = self.create()
+        first = notifications.claim_batch(10)
+
+        # аренда первого воркера истекла, строку забрал второй
+        models.Notification.objects.filter(id=notification.id).update(next_attempt_at=timezone.now())
+        second = notifications.claim_batch(10)
+
+        self.assertEqual(notifications.save_results(first, {notification.id: 'timeout'}), (0, 0))
+        self.assertEqual(notifications.save_results(second, {}), (1, 0))
+
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, models.Notification.DELIVERED)
+        self.assertEqual(notification.attempts, 0)
+
+    def test_recipient_interval_spans_batches(self):
+        self.create()
+        notifications.run_once(notifications.FakeTransport())
+        self.create()
+
+        # второй пачке (и другому воркеру) виден момент прошлой отправки
+        with mock.patch.object(notifications.asyncio, 'sleep', new_callable=mock.AsyncMock) as sleep:
+            self.assertEqual(notifications.run_once(notifications.FakeTransport()), (1, 0))
+
+        sleep.assert_awaited_once()
+        self.assertGreater(sleep.await_args.args[0], 0)
+
+    def test_transport_must_be_configured(self):
+        with self.settings(NOTIFICATION_TRANSPORT=None):
+            with self.assertRaises(ImproperlyConfigured):
+                notifications.get_transport()
+
+    def test_failed_delivery_is_retried_with_backoff(self):
+        notification = self.create()
+        transport = notifications.FakeTransport()
+        transport.fail_for.add('@owner')
+
+        self.assertEqual(notifications.run_once(transport), (0, 1))
+
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, models.Notification.PENDING)
+        self.assertEqual(notification.attempts, 1)
+        self.assertGreater(notification.next_attempt_at, timezone.now())
+
+
+class DeadlineSchedulerTest(TestCase):
+    def setUp(self):
+        department = models.Department.objects.create(name='IT')
+        self.profile = create_profile('owner', department)
+        self.now = timezone.make_aware(datetime(2025, 1, 6, 9, 0))
+
+    def test_reminders_follow_deadline_edits(self):
+        task = models.Task.objects.create(title='report', managed_by=self.profile,
+                                          deadline=self.now + timedelta(hours=30))
+        scheduler = DeadlineScheduler()
+
+        self.assertEqual(scheduler.tick(self.now), [])
+
+        created = scheduler.tick(self.now + timedelta(hours=6))
+        self.assertEqual([n.type for n in created], ['deadline_86400'])
+
+        # дедлайн перенесли ближе - напоминание за час по новому времени
+        task.deadline = self.now + timedelta(hours=8)
+        task.save()
+
+        self.assertEqual(scheduler.tick(self.now + timedelta(hours=6, minutes=30)), [])
+        created = scheduler.tick(self.now + timedelta(hours=7))
+        self.assertEqual([(n.type, n.send_time) for n in created],
+                         [('deadline_3600', self.now + timedelta(hours=7))])
+
+        # старое напоминание за час не срабатывает
+        self.assertEqual(scheduler.tick(self.now + timedelta(hours=29)), [])
+        self.assertEqual(models.Notification.objects.count(), 2)
+
+    def test_late_committed_change_is_applied(self):
+        task = models.Task.objects.create(title='report', managed_by=self.profile,
+                                          deadline=self.now + timedelta(hours=30))
+        other = models.Task.objects.create(title='other', managed_by=self.profile,
+                                           deadline=self.now + timedelta(hours=30))
+        scheduler = DeadlineScheduler()
+        scheduler.tick(self.now)
+
+        task.deadline = self.now + timedelta(hours=3)
+        task.save()
+        other.save()
+
+        # запись с меньшим id ещё не закоммичена, когда планировщик читает журнал
+        late = models.TaskChange.objects.get(task_id=task.id, id__gt=scheduler.last_change_id)
+        late_id = late.id
+        late.delete()
+        scheduler.tick(self.now + timedelta(minutes=1))
+        late.id = late_id
+        late.save()
+
+        created = scheduler.tick(self.now + timedelta(hours=2))
+        self.assertEqual([(n.task_id, n.type) for n in created], [(task.id, 'deadline_3600')])
+
+
+class ConflictCheckTest(TestCase):
+    def setUp(self):
+        self.department = models.Department.objects.create(name='IT')
+        self.profiles = [create_profile(f'user{i}', self.department) for i in range(10)]
+
+        models.Vacation.objects.create(user_schedule=self.profiles[0].schedule,
+                                       date_start=date(2025, 1, 7),
+                                       date_end=date(2025, 1, 8),
+                                       tag='vacation')
+        holiday = models.Holiday.objects.create(name='New Year',
+                                                date_time_start=timezone.make_aware(datetime(2025, 1, 1)),
+                                                date_time_end=timezone.make_aware(datetime(2025, 1, 2)))
+        holiday.department.add(self.department)
+
+    def at(self, day, hour):
+        return timezone.make_aware(datetime(2025, 1, day, hour, 0))
+
+    def test_many_pairs_in_fixed_queries(self):
+        pairs = [(profile, self.at(6, 10)) for profile in self.profiles]
+        pairs += [
+            (self.profiles[0], self.at(6, 20)),
+            (self.profiles[0], self.at(6, 13)),
+            (self.profiles[0], self.at(7, 10)),
+            (self.profiles[1], self.at(1, 10)),
+        ]
+
+        with self.assertNumQueries(4):
+            conflicts = check_conflicts(pairs)
+
+        self.assertEqual(conflicts[:10], [None] * 10)
+        self.assertEqual(conflicts[10:], [
+            'Work hours: 09:00 - 18:00',
+            'Personal time: 13:00 - 14:00',
+            'Vacation: 2025-01-07 - 2025-01-08',
+            'Holiday: New Year',
+        ])
+
+    def test_endpoint_rejects_bad_shapes_and_oversized_requests(self):
+        self.client.force_login(self.profiles[0].django_user)
+        item = {'user': self.profiles[0].id, 'deadline': '2025-01-06T10:00:00'}
+
+        for body in ({'items': item}, {'items': 'abc'}, {'items': [[1, 2]]}, {'items': [{'user': 1}]}, [item],
+                     {'items': [item] * (MAX_CONFLICT_PAIRS + 1)}):
+            response = self.client.post('/tasks/check_conflicts/', body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, str(body)[:50])
+
+        response = self.client.post('/tasks/check_conflicts/', {'items': [item]}, content_type='application/json')
+        self.assertEqual(response.json()['results'][0]['conflict'], None)
+
+
+class VacationOverlapTest(TestCase):
+    def setUp(self):
+        department = models.Department.objects.create(name='IT')
+        self.schedule = create_profile('owner', department).schedule
+
+        for month in range(1, 12):
+            models.Vacation.objects.create(user_schedule=self.schedule,
+                                           date_start=date(2024, month, 1),
+                                           date_end=date(2024, month, 5),
+                                           tag='vacation')
+
+    def form(self, date_start, date_end):
+        return AddUserVacation({'date_start': date_start, 'date_end': date_end, 'tag': 'vacation'},
+                               user_schedule=self.schedule)
+
+    def test_overlap_is_one_query(self):
+        form = self.form('2024-03-04', '2024-03-10')
+
+        with self.assertNumQueries(1):
+            self.assertFalse(form.is_valid())
+
+        self.assertIn('2024-03-01 — 2024-03-05', str(form.errors))
+        self.assertTrue(self.form('2024-03-06', '2024-03-10').is_valid())
+
+
+class MetricsTest(TestCase):
+    def test_observe_and_render(self):
+        registry = Registry()
+        registry.observe('tasks', 'GET', 200, 0.02, 4, 0.005, 1000)
+        registry.observe('tasks', 'GET', 500, 3, 6, 0.01, 10)
+
+        text = registry.render()
+
+        self.assertIn('http_request_duration_seconds_bucket{view="tasks",method="GET",le="0.025"} 1', text)
+        self.assertIn('http_request_duration_seconds_bucket{view="tasks",method="GET",le="+Inf"} 2', text)
+        self.assertIn('http_request_db_queries_total{view="tasks",method="GET"} 10', text)
+        self.assertIn('http_request_errors_total{view="tasks",method="GET"} 1', text)
+
+
+class ProfilerTest(TestCase):
+    def test_staff_request_is_profiled_and_store_is_capped(self):
+        staff = User.objects.create(username='staff', is_staff=True)
+
+        def view(request):
+            list(models.Department.objects.all())
+            return HttpResponse('ok')
+
+        middleware = ProfilerMiddleware(view)
+
+        with mock.patch('manager.profiling.PROFILER_MAX_REPORTS', 2):
+            for _ in range(3):
+                request = RequestFactory().get('/tasks/', HTTP_X_PROFILE='1')
+                request.user = staff
+                response = middleware(request)
+
+        self.assertEqual(models.ProfileReport.objects.count(), 2)
+
+        self.assertEqual(response['X-Profile-Report'], 'saved')
+        report = models.ProfileReport.objects.first()
+        self.assertEqual(report.query_count, 1)
+        self.assertIn('manager_department', report.sql)
+        self.assertIn('cumulative', report.report)
+
+        request = RequestFactory().get('/tasks/', HTTP_X_PROFILE='1')
+        request.user = User.objects.create(username='regular')
+        self.assertNotIn('X-Profile-Report', middleware(request))
+
+
+class NPlusOneTest(TestCase):
+    def setUp(self):
+        department = models.Department.objects.create(name='IT')
+        for i in range(5):
+            create_profile(f'user{i}', department)
+
+    def test_repeated_queries_from_one_line_raise(self):
+        with self.assertRaisesMessage(NPlusOneError, '5 similar queries'):
+            with detect_n_plus_one():
+                [str(profile) for profile in models.CustomUser.objects.all()]
+
+    def test_joined_queries_pass(self):
+        with detect_n_plus_one():
+            [str(profile) for profile in models.CustomUser.objects.select_related('django_user')]
+
+
+class AdminChangelistTest(TestCase):
+    def setUp(self):
+        department = models.Department.objects.create(name='IT')
+        status = models.Status.objects.create(name='new')
+        for i in range(5):
+            profile = create_profile(f'user{i}', department)
+            task = models.Task.objects.create(title=f'Task {i}', assigned_by=profile, managed_by=profile,
+                                              status=status)
+            models.Notification.objects.create(user=profile, task=task, type='deadline', message='m')
+            models.Vacation.objects.create(user_schedule=profile.schedule, date_start=date(2025, 2, 1 + i),
+                                           date_end=date(2025, 2, 1 + i), tag='vacation')
+        self.client.force_login(User.objects.create_superuser(username='admin', password='admin'))
+
+    def test_changelists_without_n_plus_one(self):
+        for model in ('task', 'notification', 'userschedule', 'customuser', 'vacation'):
+            with detect_n_plus_one():
+                response = self.client.get(f'/admin/manager/{model}/')
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, 'User4 Test')
+
+
+class AutocompleteTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        department = models.Department.objects.create(name='IT')
+        cls.profiles = [create_profile(f'user{i:02}', department) for i in range(25)]
+        for i in range(25):
+            models.Task.objects.create(title=f'Report {i}', managed_by=cls.profiles[0])
+        models.Task.objects.create(title='Meeting', managed_by=cls.profiles[0])
+
+    def setUp(self):
+        self.client.force_login(self.profiles[0].django_user)
+
+    def test_task_prefix_search_with_keyset_pages(self):
+        first = self.client.get('/autocomplete/tasks/', {'q': 'rep'}).json()
+        self.assertEqual(len(first['results']), 20)
+        self.assertIsNotNone(first['next'])
+
+        second = self.client.get('/autocomplete/tasks/', {'q': 'rep', 'cursor': first['next']}).json()
+        self.assertEqual(len(second['results']), 5)
+        self.assertIsNone(second['next'])
+
+        ids = [item['id'] for item in first['results'] + second['results']]
+        self.assertEqual(len(set(ids)), 25)
+        self.assertTrue(all(item['text'].startswith('Report') for item in second['results']))
+
+    def test_user_search_matches_every_word(self):
+        response = self.client.get('/autocomplete/users/', {'q': 'test user07'}).json()
+        self.assertEqual([item['id'] for item in response['results']], [self.profiles[7].id])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/autocomplete/users/', {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_form_renders_only_selected_options(self):
+        task = models.Task.objects.get(title='Meeting')
+        form = CreateTaskForm(initial={'head_task': task.id, 'managed_by': self.profiles[3].id})
+
+        with self.assertNumQueries(2):
+            html = str(form['head_task']) + str(form['managed_by'])
+
+        self.assertEqual(html.count('<option'), 4)
+        self.assertIn('data-autocomplete-url="/autocomplete/users/"', html)
+
+
+class UserDirectoryTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        it = models.Department.objects.create(name='IT')
+        sales = models.Department.objects.create(name='Sales')
+        cls.me = create_profile('me', it)
+        cls.colleagues = [create_profile(f'dev{i:02}', it) for i in range(30)]
+        cls.colleagues += [create_profile(f'sale{i:02}', sales) for i in range(30)]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.me.django_user)
+
+    def test_pages_are_grouped_by_department(self):
+        first = self.client.get('/users/directory/').json()
+        second = self.client.get('/users/directory/', {'cursor': first['next']}).json()
+
+        self.assertEqual([group['department']['name'] for group in first['groups']], ['IT', 'Sales'])
+        self.assertEqual([group['department']['name'] for group in second['groups']], ['Sales'])
+        self.assertIsNone(second['next'])
+
+        ids = [user['id'] for page in (first, second) for group in page['groups'] for user in group['users']]
+        self.assertEqual(len(set(ids)), 60)
+        self.assertNotIn(self.me.id, ids)
+
+    def test_search_by_department(self):
+        response = self.client.get('/users/directory/', {'q': 'sal'}).json()
+        self.assertEqual(sum(len(group['users']) for group in response['groups']), 30)
+
+    def test_filter_by_department(self):
+        sales = models.Department.objects.get(name='Sales')
+        response = self.client.get('/users/directory/', {'department': sales.id}).json()
+        self.assertEqual([group['department']['name'] for group in response['groups']], ['Sales'])
+
+        response = self.client.get('/users/directory/', {'department': 'sales'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], 'Invalid department')
+
+    def test_recent_colleagues(self):
+        picked = [self.colleagues[5].id, self.colleagues[40].id]
+        self.client.post('/users/recent/', json.dumps({'users': picked + [self.me.id]}),
+                         content_type='application/json')
+
+        response = self.client.get('/users/directory/').json()
+        self.assertEqual([user['id'] for user in response['recent']], picked)
+
+    def test_index_does_not_render_users(self):
+        response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'dev05')
+
+
+class TaskSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        department = models.Department.objects.create(name='IT')
+        cls.profile = create_profile('user', department)
+        cls.other = create_profile('other', department)
+        cls.new = models.Status.objects.create(name='new')
+        cls.done = models.Status.objects.create(name='done')
+        cls.tag = models.Tag.objects.create(category='backend', subcategory='bug', for_what='client')
+
+        cls.release = models.Task.objects.create(title='Release planning', managed_by=cls.profile, status=cls.new)
+        cls.subtask = models.Task.objects.create(title='Write notes', head_task=cls.release,
+                                                 managed_by=cls.other, status=cls.done)
+        cls.tagged = models.Task.objects.create(title='Fix login', tag=cls.tag,
+                                                managed_by=cls.profile, status=cls.new)
+        for i in range(25):
+            models.Task.objects.create(title=f'Report release {i}', managed_by=cls.profile, status=cls.new)
+
+    def setUp(self):
+        self.client.force_login(self.profile.django_user)
+
+    def search(self, **params):
+        return self.client.get('/tasks/search/', params).json()
+
+    def ids(self, response):
+        return [task['id'] for task in response['results']]
+
+    def test_matches_tag_and_parent_title(self):
+        self.assertEqual(self.ids(self.search(q='backend client')), [self.tagged.id])
+        self.assertIn(self.subtask.id, self.ids(self.search(q='planning')))
+
+    def test_filters(self):
+        response = self.search(q='release', status='done', assignee=self.other.id)
+        self.assertEqual(self.ids(response), [self.subtask.id])
+
+    def test_ranked_keyset_pages(self):
+        first = self.search(q='release')
+        second = self.search(q='release', cursor=first['next'])
+
+        ids = self.ids(first) + self.ids(second)
+        self.assertEqual(len(ids), 27)
+        self.assertEqual(len(set(ids)), 27)
+        self.assertIsNone(second['next'])
+
+        ranks = [task['rank'] for task in first['results'] + second['results']]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+
+    def test_wrong_shaped_cursor_is_rejected(self):
+        for values in ([{'a': 1}], [{'a': 1}, 1], [[1], 1], ['not a date', 1], [5, 1]):
+            response = self.client.get('/tasks/search/', {'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, 400, values)
+            self.assertEqual(response.json()['message'], 'Invalid cursor')
+
+    def test_parent_rename_and_tag_change_reindex(self):
+        self.release.title = 'Launch'
+        self.release.save()
+        self.tag.category = 'frontend'
+        self.tag.save()
+
+        self.assertEqual(self.ids(self.search(q='launch')), [self.release.id, self.subtask.id])
+        self.assertEqual(self.ids(self.search(q='frontend')), [self.tagged.id])
+        self.assertEqual(self.ids(self.search(q='backend')), [])
+
+    def test_deleted_task_is_not_found(self):
+        self.tagged.delete()
+        self.assertEqual(self.ids(self.search(q='login')), [])
+
+
+class TagTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        department = models.Department.objects.create(name='IT')
+        cls.profile = create_profile('user', department)
+        models.Status.objects.create(name='new')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.profile.django_user)
+
+    def create_task(self, title, **tag):
+        self.client.post('/create_task/', {
+            'title': title,
+            'managed_by': self.profile.id,
+            'priority': 'on',
+            'deadline': '2025-01-07T10:00',
+            **tag,
+        })
+        return models.Task.objects.get(title=title)
+
+    def test_create_task_reuses_tag(self):
+        first = self.create_task('first', category='dev', subcategory='bug', for_what='')
+        second = self.create_task('second', category='dev', subcategory='bug')
+        untagged = self.create_task('third')
+
+        self.assertIsNotNone(first.tag_id)
+        self.assertEqual(first.tag_id, second.tag_id)
+        self.assertIsNone(untagged.tag_id)
+        self.assertEqual(models.Tag.objects.get().to_tag(), '#dev-bug-_')
+        self.assertEqual(tags.lookup('#dev-bug-_'), first.tag_id)
+
+    def test_parts_with_dash_get_distinct_tags(self):
+        first = tags.intern('a-b', 'c', None)
+        second = tags.intern('a', 'b-c', None)
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(tags.intern('a', 'b-c'), second)
+
+    def test_edit_does_not_change_shared_tag(self):
+        first = self.create_task('first', category='dev')
+        second = self.create_task('second', category='dev')
+
+        self.client.post(f'/edit_task/{second.id}/', {
+            'title': 'second', 'managed_by': self.profile.id, 'deadline': '2025-01-07T10:00',
+            'status': second.status_id, 'category': 'ops',
+        })
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.tag.category, 'dev')
+        self.assertEqual(second.tag.category, 'ops')
+
+    def test_facet_counters(self):
+        self.create_task('a', category='dev', subcategory='bug')
+        self.create_task('b', category='dev', subcategory='bug')
+        self.create_task('c', category='dev', subcategory='feature', for_what='client')
+        self.create_task('d', category='ops')
+        models.Task.objects.get(title='d').delete()
+
+        response = self.client.get('/tasks/tags/').json()
+        self.assertEqual(len(response['categories']), 1)
+
+        dev = response['categories'][0]
+        self.assertEqual((dev['value'], dev['count']), ('dev', 3))
+        self.assertEqual({sub['value']: sub['count'] for sub in dev['subcategories']}, {'bug': 2, 'feature': 1})
+
+        counts = dict(models.Tag.objects.values_list('category', 'task_count'))
+        models.Tag.objects.update(task_count=0)
+        tags.recount()
+        self.assertEqual(dict(models.Tag.objects.values_list('category', 'task_count')), counts)
+
+        # разошедшийся счётчик не уходит в минус при удалении
+        models.Tag.objects.update(task_count=0)
+        models.Task.objects.get(title='a').delete()
+        self.assertFalse(models.Tag.objects.filter(task_count__lt=0).exists())
+
+
+class TaskTreeTest(TestCase):
+    def setUp(self):
+        department = models.Department.objects.create(name='IT')
+        self.profile = create_profile('user', department)
+        self.new = models.Status.objects.create(name='new')
+        self.done = models.Status.objects.create(name='done')
+        self.client.force_login(self.profile.django_user)
+
+        def task(title, parent=None, status=None, day=10):
+            return models.Task.objects.create(title=title, head_task=parent, managed_by=self.profile,
+                                              status=status or self.new,
+                                              deadline=timezone.make_aware(datetime(2025, 1, day, 10, 0)))
+
+        self.root = task('root', day=20)
+        self.a = task('a', self.root, day=15)
+        self.b = task('b', self.root, self.done, day=18)
+        self.a1 = task('a1', self.a, self.done, day=12)
+        self.a2 = task('a2', self.a, day=11)
+        self.deep = task('deep', self.a2, day=5)
+
+    def test_rollups_follow_changes(self):
+        rollup = models.TaskRollup.objects.get(task=self.root)
+        self.assertEqual(rollup.descendants, 5)
+        self.assertEqual(rollup.status_counts, {'new': 3, 'done': 2})
+        self.assertEqual(rollup.earliest_deadline.day, 5)
+
+        self.deep.status = self.done
+        self.deep.head_task = self.b
+        self.deep.save()
+        self.a2.delete()
+
+        rollup.refresh_from_db()
+        self.assertEqual(rollup.descendants, 4)
+        self.assertEqual(rollup.status_counts, {'new': 1, 'done': 3})
+        self.assertEqual(models.TaskRollup.objects.get(task=self.a).descendants, 1)
+
+    def test_rollup_refresh_does_not_depend_on_depth(self):
+        # сохранение листа: предки пересчитываются агрегатом и upsert, а не запросами на каждого
+        with self.assertNumQueries(2):
+            tree.refresh_rollups([self.deep.head_task_id])
+
+        self.assertEqual(models.TaskRollup.objects.get(task=self.a2).descendants, 1)
+        self.assertEqual(models.TaskRollup.objects.get(task=self.root).descendants, 5)
+
+    def test_rebuild_matches_incremental(self):
+        expected = {rollup.task_id: (rollup.descendants, rollup.status_counts, rollup.earliest_deadline)
+                    for rollup in models.TaskRollup.objects.all()}
+        tree.rebuild_rollups()
+        rebuilt = {rollup.task_id: (rollup.descendants, rollup.status_counts, rollup.earliest_deadline)
+                   for rollup in models.TaskRollup.objects.all()}
+        self.assertEqual(rebuilt, {task_id: value for task_id, value in expected.items() if value[0]})
+
+    def test_tree_endpoint_loads_any_depth_in_one_query(self):
+        with self.assertNumQueries(1):
+            root = tree.load_tree(self.root.id)
+
+        self.assertEqual([child['title'] for child in root['children']], ['a', 'b'])
+        a2 = root['children'][0]['children'][0]
+        self.assertEqual((a2['title'], a2['children'][0]['title']), ('a2', 'deep'))
+
+        response = self.client.get(f'/tasks/{self.a.id}/tree/').json()
+        self.assertEqual(response['descendants'], 3)
+        self.assertEqual(self.client.get('/tasks/0/tree/').status_code, 404)
+
+    def test_delete_subtree(self):
+        models.Notification.objects.create(user=self.profile, task=self.deep, type='deadline', message='m')
+        token = changes.current_token()
+
+        response = self.client.post(f'/delete_task/{self.a.id}/')
+        self.assertTrue(response.json()['success'])
+
+        self.assertEqual(set(models.Task.objects.values_list('title', flat=True)), {'root', 'b'})
+        self.assertFalse(models.Notification.objects.exists())
+        self.assertEqual(models.TaskRollup.objects.get(task=self.root).descendants, 1)
+
+        deleted = changes.load_changes([self.profile.id], token)['deleted']
+        self.assertEqual(set(deleted), {str(task.id) for task in (self.a, self.a1, self.a2, self.deep)})
+
+    def test_delete_subtree_covers_all_dependents(self):
+        # delete_subtrees удаляет зависимые строки сам, без сборщика: новая связь на Task должна быть ему понятна
+        for rel in tree.dependents():
+            self.assertFalse(rel.many_to_many, rel)
+            self.assertIn(rel.on_delete, (django_models.CASCADE, django_models.SET_NULL), rel)
+
+        self.assertLessEqual({models.Notification, models.TaskRollup},
+                             {rel.related_model for rel in tree.dependents()})
+
+
+class HolidayTest(TestCase):
+    start = '2025-01-06T00:00:00'
+    end = '2025-01-13T00:00:00'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.it = models.Department.objects.create(name='IT')
+        cls.sales = models.Department.objects.create(name='Sales')
+        cls.profiles = [create_profile(f'user{i}', cls.it) for i in range(5)]
+        cls.seller = create_profile('seller', cls.sales)
+
+        cls.holiday = models.Holiday.objects.create(
+            name='Founders day',
+            date_time_start=timezone.make_aware(datetime(2025, 1, 8)),
+            date_time_end=timezone.make_aware(datetime(2025, 1, 9)),
+        )
+        cls.holiday.department.add(cls.it)
+        models.Holiday.objects.create(
+            name='Next year',
+            date_time_start=timezone.make_aware(datetime(2026, 1, 1)),
+            date_time_end=timezone.make_aware(datetime(2026, 1, 2)),
+        ).department.add(cls.it, cls.sales)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.profiles[0].django_user)
+
+    def holiday_days(self, users):
+        response = self.client.get('/tasks/', {'start': self.start, 'end': self.end,
+                                               'users[]': [str(profile.id) for profile in users]})
+        return {(event['user_id'], event['start']) for event in response.json()
+                if event.get('rendering') == 'background' and 'dow' not in event}
+
+    def test_holidays_merged_once_per_department(self):
+        with mock.patch.object(holidays, 'load_department_holidays',
+                               wraps=holidays.load_department_holidays) as load:
+            days = self.holiday_days(self.profiles + [self.seller])
+
+        load.assert_called_once()
+        self.assertEqual(days, {(str(profile.id), '2025-01-08T00:00:00') for profile in self.profiles})
+
+    def test_holiday_change_invalidates_department_cache(self):
+        self.holiday_days(self.profiles)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.holiday.department.add(self.sales)
+
+        self.assertIn((str(self.seller.id), '2025-01-08T00:00:00'), self.holiday_days([self.seller]))
+
+    def test_api_range_filter_and_etag(self):
+        response = self.client.get('/api_holiday/', {'start': '2025-01-01', 'end': '2025-02-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([holiday['name'] for holiday in response.json()], ['Founders day'])
+        self.assertEqual(response.json()[0]['department'], [self.it.id])
+
+        etag = response['ETag']
+        cached = self.client.get('/api_holiday/', {'start': '2025-01-01', 'end': '2025-02-01'},
+                                 HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.holiday.save()
+        changed = self.client.get('/api_holiday/', {'start': '2025-01-01', 'end': '2025-02-01'},
+                                  HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+
+        self.assertEqual(self.client.get('/api_holiday/').status_code, 400)
+
+    def test_own_department_holidays(self):
+        self.client.force_login(self.seller.django_user)
+        response = self.client.get('/api_test_hol/', {'start': '2025-01-01', 'end': '2026-12-31'})
+        self.assertEqual([holiday['name'] for holiday in response.json()], ['Next year'])
+
+
+class TransferTest(TestCase):
+    def setUp(self):
+        department = models.Department.objects.create(name='IT')
+        self.profile = create_profile('user', department)
+        self.profile.django_user.is_staff = True
+        self.profile.django_user.save()
+        models.Status.objects.create(name='new')
+        self.client.force_login(self.profile.django_user)
+
+    def upload(self, name, content):
+        return self.client.post('/tasks/import/', {'file': SimpleUploadedFile(name, content.encode())})
+
+    def test_csv_import_with_refs_tags_and_errors(self):
+        content = (
+            'id,title,managed_by,status,deadline,priority,tag,head_task\n'
+            '7,Sub task,user,new,2025-01-06T11:00:00,no,,8\n'
+            '8,Release,user,new,2025-01-06T10:00:00,yes,#dev-bug-client,\n'
+            ',Late night,user,new,2025-01-06T20:00:00,,#ops-late-_,\n'
+            ',Nobody,ghost,,,,#hr-_-_,\n'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.upload('tasks.csv', content)
+
+        data = response.json()
+        self.assertEqual(data['created'], 2)
+        self.assertEqual([error['row'] for error in data['errors']], [3, 4])
+
+        head = models.Task.objects.get(title='Release')
+        sub = models.Task.objects.get(title='Sub task')
+        self.assertEqual(sub.head_task, head)
+        self.assertFalse(sub.priority)
+        self.assertEqual(head.tag.to_tag(), '#dev-bug-client')
+        self.assertEqual(models.Tag.objects.get(pk=head.tag_id).task_count, 1)
+        # теги отклонённых строк не создаются
+        self.assertEqual(models.Tag.objects.count(), 1)
+        self.assertEqual(models.TaskRollup.objects.get(task=head).descendants, 1)
+        self.assertEqual(set(search.search_tasks(models.Task.objects.all(), 'release')), {head, sub})
+        self.assertEqual(list(search.search_tasks(models.Task.objects.all(), 'release client')), [head])
+
+    def test_export_import_round_trip(self):
+        models.Task.objects.create(title='Parent', managed_by=self.profile,
+                                   deadline=timezone.make_aware(datetime(2025, 1, 6, 10, 0)),
+                                   tag_id=tags.intern('ops-infra', None, 'internal'))
+        models.Task.objects.create(title='Child', head_task=models.Task.objects.get(),
+                                   deadline=timezone.make_aware(datetime(2025, 1, 7, 10, 0)))
+
+        exports = {}
+        for file_format in ('csv', 'json', 'jsonl'):
+            response = self.client.get('/tasks/export/', {'format': file_format})
+            self.assertTrue(response.streaming)
+            exports[file_format] = b''.join(response.streaming_content)
+
+        for file_format, content in exports.items():
+            importer = transfer.TaskImporter(batch_size=1)
+            importer.run(transfer.READERS[file_format](io.BytesIO(content)))
+            self.assertEqual(importer.report(), {'created': 2, 'failed': 0, 'errors': []})
+
+        parent, child = models.Task.objects.filter(title__in=['Parent', 'Child']).order_by('-id')[:2][::-1]
+        self.assertEqual(child.head_task, parent)
+        # часть тега с '-' переживает выгрузку и загрузку
+        self.assertEqual((parent.tag.category, parent.tag.subcategory, parent.tag.for_what),
+                         ('ops-infra', None, 'internal'))
+        self.assertEqual(models.Tag.objects.get().task_count, 4)
+
+    def test_json_reader_handles_chunk_boundaries(self):
+        items = [{'title': 'x' * 50, 'n': i} for i in range(100)]
+        with mock.patch.object(transfer, 'JSON_READ_SIZE', 7):
+            self.assertEqual(list(transfer.read_json_array(io.BytesIO(json.dumps(items).encode()))), items)
+
+        with self.assertRaises(ValueError):
+            list(transfer.read_json_array(io.BytesIO(b'[{"title": "x"}')))
+
+    def test_staff_only(self):
+        self.profile.django_user.is_staff = False
+        self.profile.django_user.save()
+        self.assertEqual(self.client.get('/tasks/export/').status_code, 403)
+        self.assertEqual(self.upload('tasks.csv', 'title\nx\n').status_code, 403)
+
+
+class BatchOperationsTest(TestCase):
+    def setUp(self):
+        department = models.Department.objects.create(name='IT')
+        self.profile = create_profile('user', department)
+        self.other = create_profile('other', department)
+        self.new = models.Status.objects.create(name='new')
+        self.done = models.Status.objects.create(name='done')
+        self.client.force_login(self.profile.django_user)
+
+        def task(title, owner, hour=10, parent=None):
+            return models.Task.objects.create(title=title, managed_by=owner, created_by=owner, head_task=parent,
+                                              status=self.new,
+                                              deadline=timezone.make_aware(datetime(2025, 1, 6, hour, 0)))
+
+        self.root = task('root', self.profile)
+        self.a = task('a', self.profile, parent=self.root)
+        self.b = task('b', self.profile, hour=17, parent=self.root)
+        self.foreign = task('foreign', self.other)
+
+    def post(self, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/tasks/batch/', json.dumps(data), content_type='application/json')
+
+    def test_reschedule_reports_per_task_results(self):
+        response = self.post(tasks=[self.a.id, self.b.id, self.foreign.id, 999999],
+                             operation='reschedule', shift_minutes=120)
+
+        results = {result['id']: result for result in response.json()['results']}
+        self.assertTrue(results[self.a.id]['success'])
+        # 19:00 -> за пределами рабочего дня
+        self.assertIn('Work hours', results[self.b.id]['message'])
+        self.assertEqual(results[self.foreign.id]['message'], 'Forbidden')
+        self.assertEqual(results[999999]['message'], 'Task not found')
+
+        self.a.refresh_from_db()
+        self.b.refresh_from_db()
+        self.assertEqual(self.a.deadline.hour, 12)
+        self.assertEqual(self.b.deadline.hour, 17)
+        self.assertEqual(models.TaskRollup.objects.get(task=self.root).earliest_deadline.hour, 12)
+
+    def test_out_of_range_shift_is_rejected(self):
+        for minutes in (10 ** 12, 60 * 24 * 400):
+            response = self.post(tasks=[self.a.id], operation='reschedule', shift_minutes=minutes)
+            self.assertEqual(response.status_code, 400, minutes)
+
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.deadline.hour, 10)
+
+    def test_reassign_status_and_delete(self):
+        ids = [self.a.id, self.b.id]
+        broker = InMemoryBroker()
+
+        with mock.patch('manager.broker.get_broker', return_value=broker), \
+                mock.patch.object(broker, 'publish') as publish:
+            self.post(tasks=ids, operation='reassign', managed_by=self.other.id)
+        publish.assert_called_once_with({self.profile.id, self.other.id}, {'type': 'batch', 'count': 2})
+        self.assertEqual(set(models.Task.objects.filter(id__in=ids).values_list('managed_by', flat=True)),
+                         {self.other.id})
+        self.assertEqual(models.TaskChange.objects.filter(task_id__in=ids, previous_managed_by_id=self.profile.id).count(),
+                         2)
+
+        self.post(tasks=[self.root.id], operation='status', status=self.done.id)
+        self.root.refresh_from_db()
+        self.assertEqual(self.root.status, self.done)
+
+        self.post(tasks=[self.root.id, self.a.id], operation='delete')
+        self.assertFalse(models.Task.objects.filter(id__in=[self.root.id] + ids).exists())
+        self.assertTrue(models.Task.objects.filter(id=self.foreign.id).exists())
+
+        self.assertEqual(self.post(tasks=[self.foreign.id], operation='archive').status_code, 400)
+        self.assertEqual(self.post(tasks=[self.foreign.id], operation='reassign', managed_by=0).status_code, 400)
+
+
+class ConditionalGetTest(TestCase):
+    params = {'start': '2025-01-06T00:00:00', 'end': '2025-01-13T00:00:00'}
+
+    def setUp(self):
+        cache.clear()
+        department = models.Department.objects.create(name='IT')
+        self.profile = create_profile('user', department)
+        self.task = models.Task.objects.create(title='Task', managed_by=self.profile,
+                                               status=models.Status.objects.create(name='new'),
+                                               deadline=timezone.make_aware(datetime(2025, 1, 6, 10, 0)))
+        self.client.force_login(self.profile.django_user)
+
+    def test_tasks_not_modified_until_version_changes(self):
+        etag = self.client.get('/tasks/', self.params)['ETag']
+
+        with mock.patch.object(views.calendar_events, 'build_events') as build:
+            response = self.client.get('/tasks/', self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        build.assert_not_called()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.title = 'Renamed'
+            self.task.save()
+
+        response = self.client.get('/tasks/', self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Renamed')
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_compact_format_decodes_to_full_events(self):
+        models.Vacation.objects.create(user_schedule=self.profile.schedule, date_start=date(2025, 1, 8),
+                                       date_end=date(2025, 1, 9), tag='vacation')
+        full = self.client.get('/tasks/', self.params).json()
+
+        with mock.patch.object(events_module, 'COMPACT_CHUNK_SIZE', 2):
+            response = self.client.get('/tasks/', {**self.params, 'format': 'compact'})
+        self.assertTrue(response.streaming)
+        self.assertTrue(response.has_header('ETag'))
+        data = json.loads(b''.join(response.streaming_content))
+
+        decoded = [
+            {key: data['values'][key][value] if key in data['values'] else value
+             for key, value in zip(data['shapes'][row[0]], row[1:])}
+            for row in data['rows']
+        ]
+        self.assertEqual(decoded, full)
+        self.assertEqual(len(data['values']['user_id']), 1)
+
+    def test_fragments(self):
+        # первый ответ ставит CSRF-cookie, как при загрузке главной страницы
+        self.client.get('/create_task/')
+        for url in ('/create_task/', '/add_vacation/', f'/edit_task/{self.task.id}/'):
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        etag = self.client.get(f'/edit_task/{self.task.id}/')['ETag']
+        self.task.save()
+        self.assertEqual(self.client.get(f'/edit_task/{self.task.id}/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # POST не сравнивает валидаторы
+        response = self.client.post('/add_vacation/', {}, HTTP_IF_NONE_MATCH=self.client.get('/add_vacation/')['ETag'])
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,329 @@
+import csv
+import io
+import json
+from collections import Counter
+
+from django.db import transaction
+
+from . import changes, search, tags, tree
+from .holidays import parse_deadline
+from .conflicts import check_conflicts
+from .models import CustomUser, Status, Tag, Task, TaskChange, search_text
+
+
+IMPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 2000
+MAX_REPORTED_ERRORS = 100
+JSON_READ_SIZE = 64 * 1024
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'on'}
+
+# колонки экспорта = колонки импорта; id из файла при импорте - только ссылка для head_task
+# части тега отдельными колонками: в '#cat-sub-for' часть с '-' не разобрать обратно
+TAG_FIELDS = ('category', 'subcategory', 'for_what')
+FIELDS = ('id', 'title', 'managed_by', 'status', 'deadline', 'priority', *TAG_FIELDS, 'head_task')
+# колонка tag ('#cat-sub-for') принимается от старых выгрузок
+IMPORT_FIELDS = FIELDS + ('tag',)
+EXPORT_VALUES = ('id', 'title', 'managed_by__django_user__username', 'status__name', 'deadline', 'priority',
+                 'tag__category', 'tag__subcategory', 'tag__for_what', 'head_task_id')
+
+
+def read_csv(stream):
+    yield from csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+
+
+def read_json_lines(stream):
+    for line in io.TextIOWrapper(stream, encoding='utf-8-sig'):
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_json_array(stream):
+    # [{...}, {...}] по кускам: в памяти только текущий кусок, а не весь файл
+    decoder = json.JSONDecoder()
+    reader = io.TextIOWrapper(stream, encoding='utf-8-sig')
+    buffer = ''
+    started = False
+
+    while True:
+        chunk = reader.read(JSON_READ_SIZE)
+        buffer += chunk
+
+        while True:
+            buffer = buffer.lstrip()
+            if not started:
+                if not buffer:
+                    break
+                if buffer[0] != '[':
+                    raise ValueError('Expected a JSON array')
+                buffer = buffer[1:]
+                started = True
+            elif buffer.startswith(','):
+                buffer = buffer[1:]
+            elif buffer.startswith(']'):
+                return
+            else:
+                try:
+                    item, end = decoder.raw_decode(buffer)
+                except json.JSONDecodeError:
+                    # объект не дочитан - нужен следующий кусок
+                    break
+                yield item
+                buffer = buffer[end:]
+
+        if not chunk:
+            raise ValueError('Unexpected end of JSON')
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json_array,
+    'jsonl': read_json_lines,
+}
+
+
+def guess_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower()
+    return extension if extension in READERS else 'csv'
+
+
+def clean(value):
+    return '' if value is None else str(value).strip()
+
+
+class TaskImporter:
+    # строки -> пачки: поиск связей пачкой, проверка расписаний пачкой, bulk_create в транзакции на пачку
+    def __init__(self, created_by=None, batch_size=IMPORT_BATCH_SIZE, check_schedule=True):
+        self.created_by = created_by
+        self.batch_size = batch_size
+        self.check_schedule = check_schedule
+        # id из файла -> (id созданной задачи, название)
+        self.refs = {}
+        self.statuses = {}
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+
+    def run(self, rows):
+        batch = []
+
+        for line, row in enumerate(rows, 1):
+            batch.append((line, row))
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch)
+                batch = []
+
+        if batch:
+            self.import_batch(batch)
+
+        return self
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': line, 'message': message})
+
+    def report(self):
+        errors = sorted(self.errors, key=lambda error: error['row'])
+        return {'created': self.created, 'failed': self.error_count, 'errors': errors}
+
+    def import_batch(self, batch):
+        rows = []
+        for line, row in batch:
+            if isinstance(row, dict):
+                rows.append((line, {key: clean(row.get(key)) for key in IMPORT_FIELDS}))
+            else:
+                self.error(line, 'Row must be an object')
+
+        users, heads = self.lookups([row for line, row in rows])
+        batch_refs = {row['id'] for line, row in rows if row['id']}
+
+        parsed = []
+        for line, row in rows:
+            try:
+                parsed.append((line, row['id'], self.build_task(row, users, heads, batch_refs)))
+            except ValueError as e:
+                self.error(line, str(e))
+
+        if self.check_schedule:
+            parsed = self.drop_conflicts(parsed)
+
+        # подзадачи, ссылающиеся на строки этой же пачки, создаются следующим проходом
+        while parsed:
+            ready = [item for item in parsed if getattr(item[2], 'head_ref', None) in (None, *self.refs)]
+            if not ready:
+                for line, ref, task in parsed:
+                    self.error(line, f'head_task not found: {task.head_ref}')
+                break
+
+            self.create([(ref, task) for line, ref, task in ready])
+            created = {line for line, ref, task in ready}
+            parsed = [item for item in parsed if item[0] not in created]
+
+    def lookups(self, rows):
+        usernames = {row['managed_by'] for row in rows if row['managed_by']}
+        users = {
+            profile.django_user.username: profile
+            for profile in CustomUser.objects.select_related('django_user')
+            .filter(django_user__username__in=usernames)
+        }
+
+        missing = {row['status'] for row in rows if row['status']} - self.statuses.keys()
+        if missing:
+            self.statuses.update(Status.objects.filter(name__in=missing).values_list('name', 'id'))
+
+        head_ids = {int(row['head_task']) for row in rows
+                    if row['head_task'].isdigit() and row['head_task'] not in self.refs}
+        heads = dict(Task.objects.filter(id__in=head_ids).values_list('id', 'title'))
+
+        return users, heads
+
+    @staticmethod
+    def tag_triple(row):
+        # здесь тег только разбираем; Tag создаётся в create() для строк, которые вставляются
+        if any(row[key] for key in TAG_FIELDS):
+            return tuple(tags.normalize(row[key]) for key in TAG_FIELDS)
+        if row['tag']:
+            return tuple(tags.normalize(value) for value in tags.parse_tag(row['tag']))
+        return None
+
+    def build_task(self, row, users, heads, batch_refs):
+        if not row['title']:
+            raise ValueError('title is required')
+
+        task = Task(title=row['title'][:255], created_by=self.created_by)
+
+        if row['managed_by']:
+            if row['managed_by'] not in users:
+                raise ValueError(f'User not found: {row["managed_by"]}')
+            task.managed_by = users[row['managed_by']]
+
+        if row['status']:
+            if row['status'] not in self.statuses:
+                raise ValueError(f'Status not found: {row["status"]}')
+            task.status_id = self.statuses[row['status']]
+
+        if row['deadline']:
+            task.deadline = parse_deadline(row['deadline'])
+
+        if row['priority']:
+            task.priority = row['priority'].lower() in TRUE_VALUES
+
+        triple = self.tag_triple(row)
+        if triple and any(triple):
+            task.tag_triple = triple
+
+        task.head_title = None
+        head = row['head_task']
+        if head in self.refs:
+            task.head_task_id, task.head_title = self.refs[head]
+        elif head in batch_refs:
+            task.head_ref = head
+        elif head:
+            if not head.isdigit() or int(head) not in heads:
+                raise ValueError(f'head_task not found: {head}')
+            task.head_task_id, task.head_title = int(head), heads[int(head)]
+
+        return task
+
+    def drop_conflicts(self, parsed):
+        checked = [item for item in parsed if item[2].managed_by_id]
+        conflicts = check_conflicts([(task.managed_by, task.deadline) for line, ref, task in checked])
+        rejected = set()
+
+        for (line, ref, task), conflict in zip(checked, conflicts):
+            if conflict:
+                self.error(line, conflict)
+                rejected.add(line)
+
+        return [item for item in parsed if item[0] not in rejected]
+
+    def attach_tags(self, tasks):
+        # вне транзакции пачки: id из кэша tags.intern не должны указывать на откаченные строки
+        tag_ids = {triple: tags.intern(*triple)
+                   for triple in {getattr(task, 'tag_triple', None) for task in tasks} - {None}}
+        tag_objs = Tag.objects.in_bulk(tag_ids.values()) if tag_ids else {}
+
+        for task in tasks:
+            triple = getattr(task, 'tag_triple', None)
+            if triple is not None:
+                task.tag = tag_objs[tag_ids[triple]]
+                del task.tag_triple
+
+    def create(self, items):
+        tasks = [task for ref, task in items]
+        self.attach_tags(tasks)
+
+        for task in tasks:
+            head_ref = getattr(task, 'head_ref', None)
+            if head_ref is not None:
+                task.head_task_id, task.head_title = self.refs[head_ref]
+                del task.head_ref
+
+            task.search_document = search_text(task.title, task.tag, task.head_title)
+            del task.head_title
+
+        with transaction.atomic():
+            Task.objects.bulk_create(tasks, batch_size=self.batch_size)
+
+            # bulk_create не вызывает сигналы Task - повторяем их работу пачкой
+            search.get_backend().index(tasks)
+            for tag_id, count in Counter(task.tag_id for task in tasks).items():
+                tags.change_count([tag_id], count)
+            changes.tasks_changed([(task.pk, task.managed_by_id, None, TaskChange.CREATED) for task in tasks])
+            tree.refresh_rollups({task.head_task_id for task in tasks})
+
+        for ref, task in items:
+            if ref:
+                self.refs[ref] = (task.pk, task.title)
+
+        self.created += len(tasks)
+
+
+def export_rows(queryset):
+    # серверный курсор на PostgreSQL: память не растёт с числом задач
+    for row in queryset.order_by('id').values_list(*EXPORT_VALUES).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        task_id, title, username, status, deadline, priority, category, subcategory, for_what, head_id = row
+        yield {
+            'id': task_id,
+            'title': title,
+            'managed_by': username or '',
+            'status': status or '',
+            'deadline': deadline.isoformat(),
+            'priority': priority,
+            'category': category or '',
+            'subcategory': subcategory or '',
+            'for_what': for_what or '',
+            'head_task': head_id or '',
+        }
+
+
+class Echo:
+    # csv.writer пишет строку в "файл" и сразу отдаёт её генератору
+    def write(self, value):
+        return value
+
+
+def export_csv(rows):
+    writer = csv.DictWriter(Echo(), fieldnames=FIELDS)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def export_json(rows):
+    yield '['
+    for index, row in enumerate(rows):
+        yield (',\n' if index else '\n') + json.dumps(row, ensure_ascii=False)
+    yield '\n]\n'
+
+
+def export_json_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+WRITERS = {
+    'csv': (export_csv, 'text/csv'),
+    'json': (export_json, 'application/json'),
+    'jsonl': (export_json_lines, 'application/x-ndjson'),
+}
@@ -0,0 +1,194 @@
+from collections import Counter
+
+from django.db import connection, models
+from django.db.models.expressions import RawSQL
+
+from . import changes, search, tags
+from .models import Status, Task, TaskChange, TaskRollup
+
+
+TABLE = Task._meta.db_table
+STATUS_TABLE = Status._meta.db_table
+NO_STATUS = 'none'
+
+
+def subtrees_sql(count):
+    # UNION, а не UNION ALL: на цикле в head_task рекурсия останавливается
+    roots = ', '.join(['%s'] * count)
+    return f'''
+        WITH RECURSIVE subtree(id) AS (
+            SELECT id FROM {TABLE} WHERE id IN ({roots})
+            UNION
+            SELECT child.id FROM {TABLE} child JOIN subtree ON child.head_task_id = subtree.id
+        )
+        SELECT id FROM subtree
+    '''
+
+
+SUBTREE_SQL = subtrees_sql(1)
+
+
+def rollups_sql(count):
+    # сводки всех предков одним запросом: предки снизу вверх, их поддеревья, агрегат по (предок, статус);
+    # у предка без потомков - одна строка с нулём
+    ids = ', '.join(['%s'] * count)
+    return f'''
+        WITH RECURSIVE ancestors(id) AS (
+            SELECT id FROM {TABLE} WHERE id IN ({ids})
+            UNION
+            SELECT task.head_task_id FROM {TABLE} task JOIN ancestors ON task.id = ancestors.id
+            WHERE task.head_task_id IS NOT NULL
+        ),
+        subtree(root, id) AS (
+            SELECT ancestors.id, child.id FROM ancestors JOIN {TABLE} child ON child.head_task_id = ancestors.id
+            UNION
+            SELECT subtree.root, child.id FROM subtree JOIN {TABLE} child ON child.head_task_id = subtree.id
+        )
+        SELECT ancestors.id AS task_id, status.name AS status_name,
+               COUNT(task.id) AS descendants, MIN(task.deadline) AS earliest_deadline
+        FROM ancestors
+        LEFT JOIN subtree ON subtree.root = ancestors.id AND subtree.id <> ancestors.id
+        LEFT JOIN {TABLE} task ON task.id = subtree.id
+        LEFT JOIN {STATUS_TABLE} status ON status.id = task.status_id
+        GROUP BY ancestors.id, status.name
+    '''
+
+
+def subtree(task_id):
+    # задача и все её потомки одним запросом
+    return Task.objects.filter(id__in=RawSQL(SUBTREE_SQL, [task_id]))
+
+
+def refresh_rollups(task_ids):
+    # пересчёт всех предков: один агрегирующий запрос и один upsert, без запросов на каждого предка
+    task_ids = {task_id for task_id in task_ids if task_id is not None}
+    if not task_ids:
+        return
+
+    rollups = {}
+    # raw по TaskRollup: MIN(deadline) проходит через конвертеры поля (на SQLite это строка)
+    for row in TaskRollup.objects.raw(rollups_sql(len(task_ids)), list(task_ids)):
+        rollup = rollups.setdefault(row.task_id, TaskRollup(task_id=row.task_id, status_counts={}))
+        if not row.descendants:
+            continue
+
+        rollup.descendants += row.descendants
+        rollup.status_counts[row.status_name or NO_STATUS] = row.descendants
+        if rollup.earliest_deadline is None or row.earliest_deadline < rollup.earliest_deadline:
+            rollup.earliest_deadline = row.earliest_deadline
+
+    TaskRollup.objects.bulk_create(rollups.values(), update_conflicts=True, unique_fields=['task'],
+                                   update_fields=['descendants', 'status_counts', 'earliest_deadline'])
+
+
+def rebuild_rollups():
+    # полный пересчёт за один проход по задачам: после bulk_create, для старых данных
+    rows = list(Task.objects.values_list('id', 'head_task_id', 'status__name', 'deadline'))
+    parents = {task_id: head_task_id for task_id, head_task_id, status, deadline in rows}
+    rollups = {}
+
+    for task_id, head_task_id, status, deadline in rows:
+        # каждой задаче добавляем себя во всех предков
+        seen = {task_id}
+        while head_task_id is not None and head_task_id in parents and head_task_id not in seen:
+            rollup = rollups.setdefault(head_task_id, {'descendants': 0, 'status_counts': Counter(),
+                                                       'earliest_deadline': None})
+            rollup['descendants'] += 1
+            rollup['status_counts'][status or NO_STATUS] += 1
+            if rollup['earliest_deadline'] is None or deadline < rollup['earliest_deadline']:
+                rollup['earliest_deadline'] = deadline
+
+            seen.add(head_task_id)
+            head_task_id = parents[head_task_id]
+
+    TaskRollup.objects.all().delete()
+    TaskRollup.objects.bulk_create([
+        TaskRollup(task_id=task_id, descendants=rollup['descendants'],
+                   status_counts=dict(rollup['status_counts']),
+                   earliest_deadline=rollup['earliest_deadline'])
+        for task_id, rollup in rollups.items()
+    ], batch_size=1000)
+
+    return len(rollups)
+
+
+def task_node(task):
+    rollup = getattr(task, 'rollup', None)
+
+    return {
+        'id': task.id,
+        'title': task.title,
+        'status': task.status.name if task.status else None,
+        'deadline': task.deadline.isoformat(),
+        'managed_by': str(task.managed_by) if task.managed_by else None,
+        'descendants': rollup.descendants if rollup else 0,
+        'status_counts': rollup.status_counts if rollup else {},
+        'earliest_deadline': rollup.earliest_deadline.isoformat() if rollup and rollup.earliest_deadline else None,
+        'children': [],
+    }
+
+
+def load_tree(task_id):
+    # вложенное дерево любой глубины за один запрос; None если задачи нет
+    tasks = (subtree(task_id)
+             .select_related('status', 'rollup', 'managed_by__django_user')
+             .order_by('deadline', 'id'))
+    nodes = {task.id: (task, task_node(task)) for task in tasks}
+
+    if task_id not in nodes:
+        return None
+
+    for task, node in nodes.values():
+        if task.id != task_id and task.head_task_id in nodes:
+            nodes[task.head_task_id][1]['children'].append(node)
+
+    return nodes[task_id][1]
+
+
+def dependents():
+    # все связи на Task, кроме head_task: новая FK на задачу учитывается в delete_subtrees сама.
+    # Поддерживаются on_delete CASCADE и SET_NULL (проверяет TaskTreeTest)
+    return [rel for rel in Task._meta.related_objects if rel.related_model is not Task]
+
+
+def delete_subtree(task_id):
+    return delete_subtrees([task_id])
+
+
+def delete_subtrees(task_ids):
+    # удаление без загрузки моделей сборщиком Django: id поддеревьев из CTE, затем DELETE пачками
+    task_ids = list(task_ids)
+    if not task_ids:
+        return 0
+
+    in_subtrees = RawSQL(subtrees_sql(len(task_ids)), task_ids)
+    rows = list(Task.objects.filter(id__in=in_subtrees).values_list('id', 'managed_by_id', 'tag_id', 'head_task_id'))
+    if not rows:
+        return 0
+
+    ids = {row[0] for row in rows}
+    # сводки пересчитываем у родителей, которые сами остаются
+    root_parent_ids = {row[3] for row in rows if row[3] not in ids}
+
+    # зависимые таблицы раньше задач
+    for rel in dependents():
+        related = rel.related_model._base_manager.filter(**{f'{rel.field.name}__in': in_subtrees})
+        if rel.on_delete is models.SET_NULL:
+            related.update(**{rel.field.name: None})
+        else:
+            related.delete()
+
+    # сами задачи - одним DELETE по тому же CTE, без сборщика и сигналов Task;
+    # FK head_task внутри поддеревьев при этом снимаются вместе со строками
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE id IN ({subtrees_sql(len(task_ids))})', task_ids)
+
+    # то, что при обычном delete() делают сигналы Task
+    changes.tasks_changed([(row_id, managed_by_id, None, TaskChange.DELETED)
+                           for row_id, managed_by_id, tag_id, head_task_id in rows])
+    search.get_backend().remove(ids)
+    for tag_id, count in Counter(row[2] for row in rows).items():
+        tags.change_count([tag_id], -count)
+    refresh_rollups(root_parent_ids)
+
+    return len(rows)
@@ -6,7 +6,22 @@ urlpatterns = [
     path('api_holiday/', api.HolidayApiView.as_view(), name='api_holiday'),
     path('api_test_hol/', api.get_holiday, name='get_holiday'),
     path('', views.IndexView.as_view(), name='index'),
+    path('metrics/', views.metrics_view, name='metrics'),
     path('tasks/', views.get_tasks, name='tasks'),
+    path('tasks/batch/', views.batch_tasks, name='batch_tasks'),
+    path('tasks/import/', views.import_tasks, name='import_tasks'),
+    path('tasks/export/', views.export_tasks, name='export_tasks'),
+    path('tasks/search/', views.search_tasks, name='search_tasks'),
+    path('tasks/tags/', views.tag_facets, name='tag_facets'),
+    path('tasks/<int:task_id>/tree/', views.task_tree, name='task_tree'),
+    path('tasks/changes/', views.get_task_changes, name='task_changes'),
+    path('tasks/stream/', views.task_events_stream, name='task_events_stream'),
+    path('tasks/check_conflicts/', views.check_task_conflicts, name='check_task_conflicts'),
+    path('availability/', views.availability, name='availability'),
+    path('autocomplete/tasks/', views.autocomplete_tasks, name='autocomplete_tasks'),
+    path('autocomplete/users/', views.autocomplete_users, name='autocomplete_users'),
+    path('users/directory/', views.user_directory, name='user_directory'),
+    path('users/recent/', views.remember_recent_users, name='remember_recent_users'),
     path('login/', auth_views.LoginView.as_view(template_name='login.html'), name='login'),
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
     path('profile/', views.profile_view, name='profile'),
@@ -1,35 +1,50 @@
-from datetime import time
-from datetime import datetime, timedelta
+import asyncio
+import csv
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
 from django.conf import settings
 from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import PasswordChangeForm
-from django.http import JsonResponse, HttpResponse
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django.views.generic import TemplateView
 from django.contrib import messages
-from . import models, forms
-import json, os
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from asgiref.sync import sync_to_async
+from . import batch, broker, cache, changes, directory, freebusy, holidays, metrics, models, forms, search, tags, transfer, tree
+from . import events as calendar_events
+from .conflicts import MAX_CONFLICT_PAIRS, check_conflicts
+from .holidays import parse_deadline
+from .pagination import keyset_page
 
 from django.contrib.auth.models import User
 
 
+STREAM_PING_INTERVAL = 15
+AUTOCOMPLETE_LIMIT = 20
+DIRECTORY_LIMIT = 50
+SEARCH_LIMIT = 20
+
+
 @method_decorator(login_required(login_url='/login'), name='dispatch')
 class IndexView(TemplateView):
     template_name = 'index.html'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-
-        users = User.objects.exclude(id=self.request.user.id).order_by('username')
-        context['users'] = users
-
+    # список коллег страница не рендерит - его подгружает /users/directory/
 
-        return context
 
-
-def get_tasks(request):
+def get_selected_users(request):
     selected_users = request.GET.getlist('users[]')
 
     if not selected_users:
@@ -39,171 +54,480 @@ def get_tasks(request):
         if current_user_id not in selected_users:
             selected_users.append(current_user_id)
 
+    return selected_users
+
+
+def versions_etag(*parts):
+    return hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def csrf_secret(request):
+    # форма содержит CSRF-токен: после смены секрета (логин) старый HTML не годится
+    return request.META.get('CSRF_COOKIE', '')
+
+
+def tasks_etag(request):
+    # версии выбранных пользователей + общая версия праздников; сам ответ не строим
+    selected_users = get_selected_users(request)
+    versions = cache.get_versions(selected_users + [cache.HOLIDAYS_VERSION])
+    return versions_etag(*(versions[user_id] for user_id in selected_users), versions[cache.HOLIDAYS_VERSION])
+
+
+def form_etag(request, *args, **kwargs):
+    # пустые формы меняются только вместе с CSRF-секретом и датой (срок по умолчанию - сегодня + 3 дня)
+    return versions_etag(request.path, request.user.id, csrf_secret(request), timezone.now().date())
+
+
+def edit_task_etag(request, task_id):
+    # updated_at задачи и родителя (его название - в выбранной опции head_task)
+    task = (models.Task.objects.filter(id=task_id)
+            .values('updated_at', 'head_task__updated_at')
+            .first())
+    if task is None:
+        return None
+
+    return versions_etag(task['updated_at'], task['head_task__updated_at'], request.user.id, csrf_secret(request))
+
+
+def conditional_get(etag_func):
+    # ETag/304 только для GET: POST тех же view выполняется всегда, без 412 по If-None-Match
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            response = conditional_view(request, *args, **kwargs)
+            # ответы персональные; браузер хранит их, но каждый раз сверяет ETag
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+@conditional_get(tasks_etag)
+def get_tasks(request):
+    selected_users = get_selected_users(request)
+
     start = request.GET.get("start")
     end = request.GET.get("end")
 
+    # токен берём до загрузки, чтобы изменения во время загрузки пришли при синхронизации
+    sync_token = changes.current_token()
+
     # Преобразуем даты для Vacation (убираем время)
     start_date_only = start.split('T')[0] if start else None
     end_date_only = end.split('T')[0] if end else None
 
-    events = []
+    cached_events, versions = cache.get_user_events(selected_users, start, end)
+    missed_events = {}
+
+    # все промахи кэша грузим одним набором запросов
+    missed_users = [user_id for user_id in selected_users if user_id not in cached_events]
+    if missed_users:
+        missed_events = calendar_events.build_events(missed_users, start, end,
+                                                     start_date_only, end_date_only)
+        cache.set_user_events(missed_events, versions, start, end)
+
+    # праздники считаются и кэшируются по отделу, к пользователю только копируются
+    holiday_events = holidays.holiday_events(versions, start, end) if start and end else {}
 
+    event_groups = []
     for user_id in selected_users:
-        tasks_file = os.path.join(settings.STATIC_ROOT, f'tasks_user_{user_id}.json')
+        if user_id in cached_events:
+            event_groups.append(cached_events[user_id])
+        else:
+            event_groups.append(missed_events[user_id])
+        event_groups.append(holiday_events.get(user_id, []))
 
-        use_cache = False
-        user_events = []
-        background_events = []
+    # ?format=compact - словари вместо повторяющихся строк, ответ без сборки в памяти
+    if request.GET.get('format') == 'compact':
+        response = StreamingHttpResponse(calendar_events.compact_stream(event_groups),
+                                         content_type='application/json')
+    else:
+        response = JsonResponse([event for events in event_groups for event in events], safe=False)
 
-        if os.path.exists(tasks_file):
-            try:
-                with open(tasks_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-            except json.JSONDecodeError:
-                data = {}
-
-            last_task_update = models.Task.objects.filter(
-                managed_by_id=user_id
-            ).order_by('-updated_at').first()
-
-            last_schedule_update = models.UserSchedule.objects.filter(
-                user_id=user_id
-            ).order_by('-id').first()
-
-            last_vacation_update = models.Vacation.objects.filter(
-                user_schedule__user_id=user_id
-            ).order_by('-id').first()
-
-            cache_valid = True
-            if data.get('last_updated'):
-                if (last_task_update and
-                        last_task_update.updated_at.isoformat() != data.get('last_updated')):
-                    cache_valid = False
-                elif last_schedule_update:
-                    # Простая проверка - если есть обновления в расписании, инвалидируем кэш
-                    cache_valid = False
-                elif last_vacation_update:
-                    cache_valid = False
-
-            if cache_valid and 'tasks' in data and 'background_events' in data:
-                use_cache = True
-                user_events = data['tasks']
-                background_events = data['background_events']
-
-        if not use_cache:
-            # Загружаем задачи
-            tasks = models.Task.objects.filter(
-                managed_by_id=user_id,
-                deadline__range=[start, end],
-            ).select_related('status', 'managed_by').values(
-                'id', 'title', 'deadline', 'status__name',
-                'updated_at', 'managed_by_id', 'managed_by__django_user__first_name',
-                'managed_by__django_user__last_name'
-            )
-
-            for task in tasks:
-                status = task['status__name']
-                css_slug = status.replace(' ', '-').lower()
-
-                user_name = f"{task['managed_by__django_user__first_name']} {task['managed_by__django_user__last_name']}"
-
-                user_events.append({
-                    'id': str(task['id']),
-                    'title': f"{task['title']} ({user_name})",
-                    'start': task['deadline'].isoformat(),
-                    'end': task['deadline'].isoformat(),
-                    'status': task['status__name'],
-                    'className': 'status-' + css_slug,
-                    'user_id': str(task['managed_by_id']),
-                    'user_name': user_name
-                })
-
-            # для рабочего времени
-            try:
-                schedule = models.UserSchedule.objects.get(user_id=user_id)
-
-                start_date = datetime.fromisoformat(start).date()
-                end_date = datetime.fromisoformat(end).date()
-
-                day = start_date
-                while day <= end_date:
-                    work_start = datetime.combine(day, schedule.work_hours_start)
-                    work_end = datetime.combine(day, schedule.work_hours_end)
-
-                    day_start = datetime.combine(day, time(0, 0))
-                    if day_start < work_start:
-                        background_events.append({
-                            'start': day_start.isoformat(),
-                            'end': work_start.isoformat(),
-                            'rendering': 'background',
-                            'backgroundColor': '#1c1c1c',
-                            'user_id': str(user_id),
-                        })
-
-                    day_end = datetime.combine(day, time(23, 59, 59))
-                    if work_end < day_end:
-                        background_events.append({
-                            'start': work_end.isoformat(),
-                            'end': day_end.isoformat(),
-                            'rendering': 'background',
-                            'backgroundColor': '#1c1c1c',
-                            'user_id': str(user_id),
-                        })
-
-                    personal_start = datetime.combine(day, schedule.personal_hours_start)
-                    personal_end = datetime.combine(day, schedule.personal_hours_end)
-                    background_events.append({
-                        'start': personal_start.isoformat(),
-                        'end': personal_end.isoformat(),
-                        'rendering': 'background',
-                        'backgroundColor': '#585858',
-                        'user_id': str(user_id),
-                    })
-
-                    day += timedelta(days=1)
-
-                vacations = models.Vacation.objects.filter(
-                    user_schedule__user_id=user_id,
-                    date_end__gte=start_date_only,
-                    date_start__lte=end_date_only,
-                )
-
-                for v in vacations:
-                    background_events.append({
-                        'start': v.date_start.isoformat(),
-                        'end': (v.date_end + timedelta(days=1)).isoformat(),
-                        'rendering': 'background',
-                        'backgroundColor': '#363636',
-                        'user_id': str(user_id),
-                    })
-
-                    start_datetime = datetime.combine(v.date_start, time(0, 0))
-                    end_datetime = datetime.combine(v.date_end, time(23, 59, 59))
-
-                    background_events.append({
-                        'start': start_datetime.isoformat(),
-                        'end': end_datetime.isoformat(),
-                        'rendering': 'background',
-                        'backgroundColor': '#363636',
-                        'user_id': str(user_id),
-                    })
-
-            except models.UserSchedule.DoesNotExist:
-                schedule = None
-
-            # Сохраняем в кэш
-            last_updated = max(task['updated_at'].isoformat() for task in tasks) if tasks else ''
-            with open(tasks_file, 'w', encoding='utf-8') as f:
-                json.dump({
-                    'last_updated': last_updated,
-                    'tasks': user_events,
-                    'background_events': background_events
-                }, f, ensure_ascii=False, indent=4)
-
-        events.extend(user_events)
-        events.extend(background_events)
-
-    return JsonResponse(events, safe=False)
+    response['X-Sync-Token'] = sync_token
+    return response
+
+
+@login_required(login_url='/login')
+def get_task_changes(request):
+    selected_users = get_selected_users(request)
+    since = request.GET.get('since')
+
+    # без токена отдаём только текущий токен - клиент только что загрузил диапазон
+    if not since:
+        return JsonResponse({'token': changes.current_token(), 'reset': False,
+                             'events': [], 'deleted': []})
+
+    try:
+        since = int(since)
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Invalid sync token'}, status=400)
+
+    if changes.token_expired(since):
+        return JsonResponse({'success': False, 'message': 'Sync token expired', 'reset': True,
+                             'token': changes.current_token()}, status=410)
+
+    return JsonResponse(changes.load_changes(selected_users, since))
+
+
+# Проверка конфликтов для пачки задач за один запрос (перетаскивание в календаре)
+@login_required(login_url='/login')
+def check_task_conflicts(request):
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'POST required'}, status=405)
+
+    try:
+        items = json.loads(request.body)['items']
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            raise TypeError
+        if len(items) > MAX_CONFLICT_PAIRS:
+            return JsonResponse({'success': False,
+                                 'message': f'Send at most {MAX_CONFLICT_PAIRS} items'}, status=400)
+        pairs = [(int(item['user']), parse_deadline(item['deadline'])) for item in items]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'message': 'Invalid request'}, status=400)
+
+    conflicts = check_conflicts(pairs)
+
+    return JsonResponse({
+        'success': True,
+        'results': [
+            {**item, 'conflict': conflict}
+            for item, conflict in zip(items, conflicts)
+        ],
+    })
+
+
+def search_users(term):
+    # каждое слово - префикс имени, фамилии, логина, отдела или должности: "ив пет" найдёт Петра Иванова
+    queryset = models.CustomUser.objects.select_related('django_user')
+
+    for word in term.split():
+        queryset = queryset.filter(Q(django_user__first_name__istartswith=word)
+                                   | Q(django_user__last_name__istartswith=word)
+                                   | Q(django_user__username__istartswith=word)
+                                   | Q(department__name__istartswith=word)
+                                   | Q(job_title__istartswith=word))
+
+    return queryset
+
+
+def autocomplete_response(request, queryset, ordering, label):
+    try:
+        items, cursor = keyset_page(queryset, ordering, request.GET.get('cursor'), AUTOCOMPLETE_LIMIT)
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Invalid cursor'}, status=400)
+
+    return JsonResponse({
+        'results': [{'id': item.pk, 'text': label(item)} for item in items],
+        'next': cursor,
+    })
+
+
+# Поиск для ленивых списков в формах задач
+@login_required(login_url='/login')
+def autocomplete_tasks(request):
+    term = request.GET.get('q', '').strip()
+    queryset = models.Task.objects.select_related('status')
+
+    if term:
+        # на PostgreSQL - индекс по UPPER(title) с text_pattern_ops
+        queryset = queryset.filter(title__istartswith=term)
+
+    return autocomplete_response(request, queryset, ('-id',), str)
+
+
+@login_required(login_url='/login')
+def autocomplete_users(request):
+    queryset = search_users(request.GET.get('q', '').strip())
+    ordering = ('django_user__last_name', 'django_user__first_name', 'id')
+
+    return autocomplete_response(request, queryset, ordering, str)
+
+
+# Полнотекстовый поиск задач: название, тег, родительская задача + фильтры
+@login_required(login_url='/login')
+def search_tasks(request):
+    text = request.GET.get('q', '').strip()
+    queryset = models.Task.objects.select_related('status', 'tag', 'head_task', 'managed_by__django_user')
+
+    try:
+        if request.GET.get('status'):
+            queryset = queryset.filter(status__name=request.GET['status'])
+        if request.GET.get('assignee'):
+            queryset = queryset.filter(managed_by_id=int(request.GET['assignee']))
+        if request.GET.get('deadline_from'):
+            queryset = queryset.filter(deadline__gte=parse_deadline(request.GET['deadline_from']))
+        if request.GET.get('deadline_to'):
+            queryset = queryset.filter(deadline__lt=parse_deadline(request.GET['deadline_to']))
+        if request.GET.get('tag'):
+            tag_id = tags.lookup(request.GET['tag'])
+            queryset = queryset.filter(tag_id=tag_id) if tag_id else queryset.none()
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Invalid filter'}, status=400)
+
+    if text:
+        queryset = search.search_tasks(queryset, text)
+        ordering = ('-rank', 'id')
+    else:
+        ordering = ('deadline', 'id')
+
+    try:
+        tasks, cursor = keyset_page(queryset, ordering, request.GET.get('cursor'), SEARCH_LIMIT)
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Invalid cursor'}, status=400)
+
+    return JsonResponse({
+        'results': [
+            {
+                'id': task.id,
+                'title': task.title,
+                'status': task.status.name if task.status else None,
+                'deadline': task.deadline.isoformat(),
+                'managed_by': str(task.managed_by) if task.managed_by else None,
+                'head_task': {'id': task.head_task.id, 'title': task.head_task.title} if task.head_task else None,
+                'tag': task.tag.to_tag() if task.tag else None,
+                'rank': getattr(task, 'rank', None),
+            }
+            for task in tasks
+        ],
+        'next': cursor,
+    })
+
+
+# Задача со всеми подзадачами и сводками по поддеревьям
+@login_required(login_url='/login')
+def task_tree(request, task_id):
+    root = tree.load_tree(task_id)
+    if root is None:
+        return JsonResponse({'success': False, 'message': 'Task not found'}, status=404)
+
+    return JsonResponse(root)
+
+
+# Число задач по уровням тегов из счётчиков, без GROUP BY по задачам
+@login_required(login_url='/login')
+def tag_facets(request):
+    return JsonResponse({'categories': tags.facets()})
+
+
+# Справочник коллег для выбора календарей: по отделам, постранично
+@login_required(login_url='/login')
+def user_directory(request):
+    term = request.GET.get('q', '').strip()
+    cursor = request.GET.get('cursor')
+    queryset = (search_users(term)
+                .select_related('department')
+                .exclude(django_user=request.user))
+
+    department = request.GET.get('department')
+    if department:
+        if not department.isdigit():
+            return JsonResponse({'success': False, 'message': 'Invalid department'}, status=400)
+        queryset = queryset.filter(department_id=int(department))
+
+    try:
+        profiles, next_cursor = keyset_page(queryset, directory.DIRECTORY_ORDERING, cursor, DIRECTORY_LIMIT)
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Invalid cursor'}, status=400)
+
+    data = {
+        'groups': directory.group_by_department(profiles),
+        'next': next_cursor,
+    }
+
+    # недавние - только на первой странице без поиска
+    if not term and not cursor and not department:
+        data['recent'] = [directory.user_entry(profile) for profile in directory.get_recent(request.user.id)]
+
+    return JsonResponse(data)
+
+
+@login_required(login_url='/login')
+def remember_recent_users(request):
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'POST required'}, status=405)
+
+    own_id = request.user.profile.id
+    try:
+        profile_ids = [int(user_id) for user_id in json.loads(request.body)['users']]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'message': 'Invalid request'}, status=400)
+
+    directory.remember_recent(request.user.id, [profile_id for profile_id in profile_ids if profile_id != own_id])
+
+    return JsonResponse({'success': True})
+
+
+# Одна операция над многими задачами: права и расписания проверяются пачкой, изменения - одним UPDATE/DELETE
+@login_required(login_url='/login')
+def batch_tasks(request):
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'POST required'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+        task_ids = [int(task_id) for task_id in data['tasks']]
+        operation = data['operation']
+        value = None
+        if operation == 'reassign':
+            value = models.CustomUser.objects.get(pk=int(data['managed_by'])).pk
+        elif operation == 'reschedule':
+            value = timedelta(minutes=int(data['shift_minutes']))
+        elif operation == 'status':
+            value = models.Status.objects.get(pk=int(data['status'])).pk
+    except (ValueError, KeyError, TypeError, OverflowError, ObjectDoesNotExist):
+        return JsonResponse({'success': False, 'message': 'Invalid request'}, status=400)
+
+    if not task_ids or len(task_ids) > batch.MAX_BATCH_TASKS:
+        return JsonResponse({'success': False,
+                             'message': f'Send 1 to {batch.MAX_BATCH_TASKS} tasks'}, status=400)
+
+    try:
+        results = batch.run_batch(request.user, task_ids, operation, value)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+    return JsonResponse({
+        'success': all(result['success'] for result in results),
+        'results': results,
+    })
+
+
+def interval_list(intervals):
+    return [[start.isoformat(), end.isoformat()] for start, end in intervals]
+
+
+# Свободное/занятое время пользователей и ближайшие общие окна длиной duration минут
+@login_required(login_url='/login')
+def availability(request):
+    user_ids = request.GET.getlist('users[]') or [str(request.user.profile.id)]
+
+    try:
+        user_ids = list(dict.fromkeys(str(int(user_id)) for user_id in user_ids))
+        range_start, range_end = holidays.parse_bounds(request.GET['start'], request.GET['end'])
+        minutes = int(request.GET.get('duration', 60))
+        limit = min(int(request.GET.get('limit', freebusy.SLOT_LIMIT)), 100)
+        if minutes <= 0 or limit <= 0:
+            raise ValueError('duration and limit must be positive')
+        # окно длиннее допустимого диапазона всё равно не найдётся; заодно нет OverflowError у timedelta
+        if minutes > freebusy.MAX_RANGE / timedelta(minutes=1):
+            raise ValueError(f'duration must be at most {freebusy.MAX_RANGE.days} days')
+        duration = timedelta(minutes=minutes)
+        if range_end - range_start > freebusy.MAX_RANGE or len(user_ids) > freebusy.MAX_USERS:
+            raise ValueError(f'At most {freebusy.MAX_USERS} users and {freebusy.MAX_RANGE.days} days')
+
+        result = freebusy.find_availability(user_ids, range_start, range_end, duration, limit)
+    except KeyError:
+        return JsonResponse({'success': False, 'message': 'start and end are required'}, status=400)
+    except (ValueError, OverflowError) as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+    return JsonResponse({
+        'users': [
+            {'user_id': user['user_id'], 'busy': interval_list(user['busy']), 'free': interval_list(user['free'])}
+            for user in result['users']
+        ],
+        'slots': interval_list(result['slots']),
+    })
+
+
+# Массовый импорт: файл читается потоком, задачи создаются пачками - каждая пачка в своей транзакции
+@login_required(login_url='/login')
+@transaction.non_atomic_requests
+def import_tasks(request):
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'message': 'Forbidden'}, status=403)
+
+    if request.method != 'POST' or 'file' not in request.FILES:
+        return JsonResponse({'success': False, 'message': 'POST a file'}, status=400)
+
+    upload = request.FILES['file']
+    file_format = request.POST.get('format') or transfer.guess_format(upload.name)
+    if file_format not in transfer.READERS:
+        return JsonResponse({'success': False, 'message': 'Unknown format'}, status=400)
+
+    importer = transfer.TaskImporter(created_by=getattr(request.user, 'profile', None))
+    try:
+        importer.run(transfer.READERS[file_format](upload.file))
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        # уже созданные пачки остаются - сообщаем, сколько успели
+        return JsonResponse({'success': False, 'message': str(e), **importer.report()}, status=400)
+
+    return JsonResponse({'success': True, **importer.report()})
+
+
+# Выгрузка всех задач потоком, без сборки файла в памяти
+@login_required(login_url='/login')
+@transaction.non_atomic_requests
+def export_tasks(request):
+    if not request.user.is_staff:
+        return HttpResponse(status=403)
+
+    file_format = request.GET.get('format', 'csv')
+    if file_format not in transfer.WRITERS:
+        return JsonResponse({'success': False, 'message': 'Unknown format'}, status=400)
+
+    writer, content_type = transfer.WRITERS[file_format]
+    response = StreamingHttpResponse(writer(transfer.export_rows(models.Task.objects.all())),
+                                     content_type=f'{content_type}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="tasks.{file_format}"'
+    return response
+
+
+def metrics_view(request):
+    # сборщик авторизуется токеном, люди - как staff
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    authorized = token and request.headers.get('Authorization') == f'Bearer {token}'
+
+    if not authorized and not request.user.is_staff:
+        return HttpResponse(status=403)
+
+    return HttpResponse(metrics.registry.render(),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# Работает только под ASGI (uvicorn project.asgi:application)
+@transaction.non_atomic_requests
+async def task_events_stream(request):
+    # под WSGI бесконечный поток навсегда занимает воркер; 204 - EventSource больше не переподключается
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=403)
+
+    selected_users = await sync_to_async(get_selected_users)(request)
+    subscription = broker.get_broker().subscribe(selected_users)
+
+    async def stream():
+        try:
+            yield 'retry: 5000\n\n'
+
+            while True:
+                try:
+                    message = await subscription.get(timeout=STREAM_PING_INTERVAL)
+                except asyncio.TimeoutError:
+                    # не даём прокси закрыть соединение по простою
+                    yield ': ping\n\n'
+                    continue
+
+                yield f'data: {json.dumps(message)}\n\n'
+        finally:
+            broker.get_broker().unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @login_required(login_url='/login')
@@ -275,6 +599,7 @@ def change_password(request):
 
 
 @login_required(login_url='/login')
+@conditional_get(form_etag)
 def add_vacation(request):
     django_user = request.user
     custom_user = django_user.profile
@@ -287,7 +612,14 @@ def add_vacation(request):
             vacation = vacation_form.save(commit=False)
             vacation.user_schedule = user_schedule
 
-            vacation.save()
+            # параллельный запрос мог успеть добавить пересекающийся отпуск
+            try:
+                with transaction.atomic():
+                    vacation.save()
+            except IntegrityError:
+                vacation_form.add_error(None, 'The vacation intersects with an existing period')
+                messages.error(request, 'Please, fix the errors')
+                return render(request, 'add_vacation.html', {'vacation_form': vacation_form})
 
             messages.success(request, 'Vacation added successful')
 
@@ -312,6 +644,7 @@ def add_vacation(request):
     return render(request, 'add_vacation.html', context)
 
 
+@conditional_get(form_etag)
 def create_task(request):
     django_user = request.user
     custom_user = django_user.profile
@@ -324,12 +657,9 @@ def create_task(request):
             task = task_form.save(commit=False)
             task.created_by = custom_user
             task.status = models.Status.objects.get(name='new')
+            task.tag_id = tags.intern(**tag_form.cleaned_data)
             task.save()
 
-            tag = tag_form.save(commit=False)
-            tag.task = task
-            tag.save()
-
             messages.success(request, 'Task created successfully!')
             return redirect('index')
         else:
@@ -344,6 +674,7 @@ def create_task(request):
     })
 
 
+@conditional_get(edit_task_etag)
 def edit_task(request, task_id):
     task = get_object_or_404(models.Task, id=task_id)
     tag = task.tag
@@ -353,11 +684,12 @@ def edit_task(request, task_id):
 
     if request.method == 'POST':
         task_form = forms.EditeTaskForm(request.POST, instance=task)
-        tag_form = forms.TagForm(request.POST, instance=tag)
+        tag_form = forms.TagForm(request.POST)
 
         if task_form.is_valid() and tag_form.is_valid():
-            task_form.save()
-            tag_form.save()
+            task = task_form.save(commit=False)
+            task.tag_id = tags.intern(**tag_form.cleaned_data)
+            task.save()
 
             messages.success(request, 'Task updated successfully')
             return redirect('index')
@@ -367,7 +699,7 @@ def edit_task(request, task_id):
 
     else:
         task_form = forms.EditeTaskForm(instance=task)
-        tag_form = forms.TagForm(instance=tag)
+        tag_form = forms.TagForm.for_tag(tag)
 
     return render(request, 'edit_task.html', {
         'task_form': task_form,
@@ -382,7 +714,8 @@ def delete_task(request, task_id):
         task = models.Task.objects.get(id=task_id)
 
         task_title = task.title
-        task.delete()
+        # поддерево удаляется пачкой, без загрузки каждой подзадачи сборщиком ORM
+        tree.delete_subtree(task.id)
 
         return JsonResponse({
             'success': True,
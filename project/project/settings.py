@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -47,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'manager.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,6 +56,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'manager.profiling.ProfilerMiddleware',
+    'manager.nplusone.NPlusOneMiddleware',
 ]
 
 ROOT_URLCONF = 'project.urls'
@@ -92,6 +96,62 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# общий кэш нужен, чтобы все воркеры видели одни и те же версии календаря
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+elif DEBUG:
+    # кэш в памяти процесса годится только для одного процесса runserver;
+    # ~3 ключа на пользователя календаря: стандартных 300 записей хватало лишь на сотню
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 30000},
+        }
+    }
+else:
+    raise ImproperlyConfigured('REDIS_URL is required: workers must share one cache '
+                               'to see calendar version bumps')
+
+CALENDAR_CACHE_TIMEOUT = 60 * 60
+
+# журнал изменений для /tasks/changes/: python manage.py prune_task_changes
+TASK_CHANGE_RETENTION_DAYS = 7
+
+# рассылка изменений задач в /tasks/stream/ (нужен ASGI-сервер)
+TASK_EVENTS_BROKER = 'manager.broker.InMemoryBroker'
+
+# доставка уведомлений: python manage.py deliver_notifications
+# FakeTransport только ничего не отправляет и помечает доставленным - по умолчанию лишь при DEBUG
+NOTIFICATION_TRANSPORT = os.getenv('NOTIFICATION_TRANSPORT',
+                                   'manager.notifications.FakeTransport' if DEBUG else None)
+
+# напоминания о дедлайнах: python manage.py schedule_reminders
+REMINDER_OFFSETS = [{'hours': 24}, {'hours': 1}]
+REMINDER_SKIP_STATUSES = ['done']
+
+# метрики /metrics/: Authorization: Bearer <METRICS_TOKEN> или staff
+METRICS_ENABLED = True
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# профилирование: staff с заголовком X-Profile или ?_profile=1, отчёты в админке
+PROFILER_SAMPLE_RATE = float(os.getenv('PROFILER_SAMPLE_RATE', 0))
+PROFILER_MAX_REPORTS = 200
+
+# поиск N+1: 'log' при разработке, 'raise' в тестах (см. TEST_RUNNER), 'off' в продакшене
+NPLUSONE_MODE = os.getenv('NPLUSONE_MODE', 'log' if DEBUG else 'off')
+NPLUSONE_THRESHOLD = 3
+
+TEST_RUNNER = 'manager.testing.NPlusOneTestRunner'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 